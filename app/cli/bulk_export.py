@@ -0,0 +1,457 @@
+"""Export many sessions of the database into one dataset.
+
+    python -m app.cli.bulk_export OUTPUT [--format parquet|csv|xlsx] [--user ID|ИМЯ ...]
+                                  [--since ДАТА] [--until ДАТА] [--label Ложь] [--workers N]
+
+Sessions are selected from ``sessions`` by user and start date, then read
+in parallel worker processes: the per-frame timeline from the session
+folder (``timeline.npz``/``timeline.json``, ``labels_over_time`` rows if the
+folder has none) and the ``segments`` rows, each with score statistics of
+the frames it spans. Results are written as they arrive, so memory holds
+only the sessions in flight. Three tables are produced: ``sessions`` (one
+summary row per session), ``frames`` and ``segments``; with ``--label`` only
+frames and segments with that label/verdict are kept.
+"""
+from __future__ import annotations
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import AppConfig
+from app.storage import SCORE_DTYPE, Session
+from app.utils.aggregation import ScoreIndex, segment_verdicts
+from app.utils.exporter import BLOCK_ROWS, TIMELINE_TABLE, Block, TableSpec, block_rows, open_sink
+from app.utils.timeline import LABEL_CODES, LABELS, Timeline, load_session_timeline
+
+APP_DIR = Path.home() / ".thermodeception"
+
+SESSIONS_TABLE = TableSpec(
+    "sessions",
+    "Sessions",
+    (
+        "session_id",
+        "user_id",
+        "user",
+        "folder",
+        "started_at",
+        "finished_at",
+        "source",
+        "frames",
+        "duration_ms",
+        "mean_score",
+        "max_score",
+        "lie_fraction",
+        "qa_segments",
+        "qa_lie",
+        "events",
+    ),
+    (
+        "session_id",
+        "user_id",
+        "Пользователь",
+        "Папка",
+        "Начало",
+        "Конец",
+        "Источник таймлайна",
+        "Кадров",
+        "Длительность, мс",
+        "Средний score",
+        "Макс. score",
+        "Доля «Ложь»",
+        "Вопросов",
+        "Вопросов «Ложь»",
+        "Событий",
+    ),
+    (
+        "int64",
+        "int64",
+        "string",
+        "string",
+        "string",
+        "string",
+        "string",
+        "int64",
+        "int64",
+        "float32",
+        "float32",
+        "float32",
+        "int64",
+        "int64",
+        "int64",
+    ),
+)
+FRAMES_TABLE = TableSpec(
+    "frames",
+    "Frames",
+    ("session_id",) + TIMELINE_TABLE.columns,
+    ("session_id",) + TIMELINE_TABLE.headers,
+    ("int64",) + TIMELINE_TABLE.types,
+)
+SEGMENTS_TABLE = TableSpec(
+    "segments",
+    "Segments",
+    (
+        "session_id",
+        "segment_id",
+        "type",
+        "question",
+        "start_ms",
+        "end_ms",
+        "label",
+        "notes",
+        "frames",
+        "mean_score",
+        "max_score",
+        "lie_fraction",
+        "above_hi_ms",
+        "verdict",
+    ),
+    (
+        "session_id",
+        "segment_id",
+        "type",
+        "question",
+        "start_ms",
+        "end_ms",
+        "label",
+        "notes",
+        "frames",
+        "mean_score",
+        "max_score",
+        "lie_fraction",
+        "above_hi_ms",
+        "verdict",
+    ),
+    (
+        "int64",
+        "int64",
+        "string",
+        "string",
+        "int64",
+        "int64",
+        "string",
+        "string",
+        "int64",
+        "float32",
+        "float32",
+        "float32",
+        "int64",
+        "string",
+    ),
+)
+
+SEGMENT_QUERY = (
+    "SELECT s.id, s.type, q.text, s.start_ms, s.end_ms, s.label, s.notes"
+    " FROM segments s LEFT JOIN questions q ON q.id = s.question_id"
+    " WHERE s.session_id=? ORDER BY s.start_ms, s.id"
+)
+
+
+@dataclass
+class SessionData:
+    session_id: int
+    folder: str
+    summary: Block
+    frames: Optional[Block]
+    segments: Block
+    pid: int
+    seconds: float
+
+
+def _read_only(db_path: str | Path) -> sqlite3.Connection:
+    # the command only reads: no write lock, no migrations, and a wrong path fails instead of creating a database
+    return sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def find_sessions(
+    conn: sqlite3.Connection, user_ids: Sequence[int] | None = None, since: str | None = None, until: str | None = None
+) -> List[Session]:
+    """Sessions started in ``[since, until)``, optionally only of ``user_ids``.
+
+    Bounds are ISO timestamps, compared as text like ``started_at`` itself.
+    """
+    query = "SELECT id, user_id, folder, started_at, finished_at FROM sessions WHERE 1"
+    params: list = []
+    if user_ids is not None:
+        query += f" AND user_id IN ({', '.join('?' * len(user_ids))})"
+        params += list(user_ids)
+    if since is not None:
+        query += " AND started_at >= ?"
+        params.append(since)
+    if until is not None:
+        query += " AND started_at < ?"
+        params.append(until)
+    return [Session(*row) for row in conn.execute(query + " ORDER BY started_at, id", params)]
+
+
+def _session_timeline(conn: sqlite3.Connection, session: Session) -> tuple[Timeline, str]:
+    folder = Path(session.folder)
+    try:
+        timeline = load_session_timeline(folder)
+    except (OSError, ValueError, KeyError):
+        timeline = None
+    if timeline is not None:
+        return timeline, "folder"
+    cur = conn.execute(
+        "SELECT timestamp_ms, score, label FROM labels_over_time WHERE session_id=? ORDER BY timestamp_ms",
+        (session.id,),
+    )
+    rows = np.fromiter(cur, dtype=SCORE_DTYPE)
+    return Timeline.from_arrays(rows["timestamp_ms"], rows["score"], rows["label"]), "db"
+
+
+def load_session(
+    db_path: str,
+    session: Session,
+    user: str,
+    threshold_hi: float,
+    label: Optional[str],
+    with_frames: bool,
+) -> SessionData:
+    """Runs in a worker: reads one session and computes its summary and segment statistics."""
+    started = time.perf_counter()
+    conn = _read_only(db_path)
+    try:
+        timeline, source = _session_timeline(conn, session)
+        rows = conn.execute(SEGMENT_QUERY, (session.id,)).fetchall()
+    finally:
+        conn.close()
+
+    ids, types, questions, starts, ends, labels, notes = (list(col) for col in zip(*rows)) if rows else ([],) * 7
+    # open segments and events are instants at their start
+    spans_end = [start if end is None else end for start, end in zip(starts, ends)]
+    index = ScoreIndex.from_timeline(timeline)
+    stats = index.aggregate(starts, spans_end, threshold_hi)
+    verdicts = segment_verdicts(stats)
+    segments = {
+        "session_id": np.full(len(rows), session.id, dtype=np.int64),
+        "segment_id": ids,
+        "type": types,
+        "question": questions,
+        "start_ms": starts,
+        "end_ms": ends,
+        "label": labels,
+        "notes": notes,
+        "frames": stats["frames"],
+        "mean_score": stats["mean"].astype(np.float32),
+        "max_score": stats["max"],
+        "lie_fraction": stats["lie_fraction"].astype(np.float32),
+        "above_hi_ms": stats["above_hi_ms"],
+        "verdict": verdicts,
+    }
+
+    codes = timeline.label_codes
+    scores = timeline.scores
+    qa = np.array([t == "qa" for t in types], dtype=bool)
+    lie = np.array([v == "Ложь" for v in verdicts], dtype=bool)
+    summary = {
+        "session_id": [session.id],
+        "user_id": [session.user_id],
+        "user": [user],
+        "folder": [session.folder],
+        "started_at": [session.started_at],
+        "finished_at": [session.finished_at],
+        "source": [source],
+        "frames": [len(timeline)],
+        "duration_ms": [int(timeline.timestamps[-1] - timeline.timestamps[0]) if len(timeline) else 0],
+        "mean_score": [float(scores.mean()) if len(scores) else float("nan")],
+        "max_score": [float(scores.max()) if len(scores) else float("nan")],
+        "lie_fraction": [float((codes == LABEL_CODES["Ложь"]).mean()) if len(codes) else float("nan")],
+        "qa_segments": [int(qa.sum())],
+        "qa_lie": [int((qa & lie).sum())],
+        "events": [int(sum(t == "event" for t in types))],
+    }
+
+    frames = None
+    if with_frames:
+        keep = slice(None) if label is None else codes == LABEL_CODES[label]
+        frames = {
+            "session_id": np.full(len(timeline), session.id, dtype=np.int64)[keep],
+            "timestamp_ms": timeline.timestamps[keep],
+            "label": codes[keep],
+            "score": scores[keep],
+            "computed": timeline.computed[keep],
+        }
+    if label is not None:
+        segments = _take(segments, np.flatnonzero(np.array(verdicts, dtype=object) == label))
+    return SessionData(session.id, session.folder, summary, frames, segments, os.getpid(), time.perf_counter() - started)
+
+
+def _take(block: Block, rows: np.ndarray) -> Block:
+    return {
+        key: values[rows] if isinstance(values, np.ndarray) else [values[i] for i in rows.tolist()]
+        for key, values in block.items()
+    }
+
+
+def _slices(block: Block, size: int = BLOCK_ROWS) -> Iterator[Block]:
+    rows = block_rows(block)
+    for start in range(0, rows, size):
+        yield {key: values[start : start + size] for key, values in block.items()}
+
+
+def bulk_export(
+    db_path: Path,
+    sessions: Sequence[Session],
+    users: Dict[int, str],
+    output: Path,
+    fmt: str,
+    threshold_hi: float,
+    label: Optional[str],
+    with_frames: bool,
+    workers: int,
+) -> int:
+    """Writes the sessions as they are read; returns the number of sessions that failed."""
+    if fmt == "xlsx":
+        output.parent.mkdir(parents=True, exist_ok=True)
+    else:
+        output.mkdir(parents=True, exist_ok=True)
+    sink = open_sink(fmt, output)
+    tables = [SESSIONS_TABLE, FRAMES_TABLE, SEGMENTS_TABLE] if with_frames else [SESSIONS_TABLE, SEGMENTS_TABLE]
+    try:
+        for spec in tables:
+            sink.begin(spec)
+
+        total = len(sessions)
+        done = failed = frames = segments = 0
+        per_worker: Dict[int, list] = {}
+        started = time.perf_counter()
+        todo = iter(sessions)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: Dict[Future, Session] = {}
+
+            def submit():
+                # a bounded number in flight keeps finished-but-unwritten sessions out of memory
+                for session in todo:
+                    args = (str(db_path), session, users.get(session.user_id, ""), threshold_hi, label, with_frames)
+                    pending[pool.submit(load_session, *args)] = session
+                    if len(pending) >= 2 * workers:
+                        break
+
+            submit()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    session = pending.pop(future)
+                    done += 1
+                    try:
+                        data = future.result()
+                    except Exception as exc:
+                        failed += 1
+                        print(f"[{done}/{total}] {session.folder}: ошибка: {exc}", file=sys.stderr)
+                        continue
+                    if label is not None and not block_rows(data.segments) and not (data.frames and block_rows(data.frames)):
+                        print(f"[{done}/{total}] {data.folder}: нет меток «{label}», пропуск")
+                        continue
+                    sink.write(SESSIONS_TABLE, data.summary)
+                    if data.frames is not None:
+                        for part in _slices(data.frames):
+                            sink.write(FRAMES_TABLE, part)
+                        frames += block_rows(data.frames)
+                    sink.write(SEGMENTS_TABLE, data.segments)
+                    segments += block_rows(data.segments)
+                    stat = per_worker.setdefault(data.pid, [0, 0.0])
+                    stat[0] += 1
+                    stat[1] += data.seconds
+                    elapsed = time.perf_counter() - started
+                    print(
+                        f"[{done}/{total}] {data.folder}: {data.summary['frames'][0]} кадров,"
+                        f" {block_rows(data.segments)} сегментов ({done / elapsed:.1f} сессий/с)"
+                    )
+                submit()
+        paths = sink.close()
+    except BaseException:
+        # a failed or interrupted export leaves no half-written tables behind
+        sink.abort()
+        raise
+    elapsed = time.perf_counter() - started
+
+    for pid, (count, seconds) in sorted(per_worker.items()):
+        print(f"worker {pid}: {count} сессий, {seconds:.1f} с чтения")
+    rate = f"{done / elapsed if elapsed else 0:.1f} сессий/с, {frames / elapsed if elapsed else 0:.0f} кадров/с"
+    print(f"Итого: {done - failed} сессий, {frames} кадров, {segments} сегментов за {elapsed:.1f} с ({rate})")
+    for path in paths:
+        print(f"Сохранено: {path}")
+    return failed
+
+
+def _date_bound(text: str, end: bool = False) -> str:
+    """ISO bound for ``started_at``; a bare ``--until`` date includes that whole day."""
+    value = datetime.fromisoformat(text)
+    if end and len(text) == 10:
+        value += timedelta(days=1)
+    return value.isoformat(timespec="seconds")
+
+
+def _resolve_users(conn: sqlite3.Connection, wanted: List[str]) -> Dict[int, str]:
+    users = dict(conn.execute("SELECT id, full_name FROM users ORDER BY full_name"))
+    if not wanted:
+        return users
+    picked = {}
+    for item in wanted:
+        matches = (
+            {int(item): users[int(item)]} if item.isdigit() and int(item) in users
+            else {uid: name for uid, name in users.items() if item.casefold() in name.casefold()}
+        )
+        if not matches:
+            raise ValueError(f"Пользователь не найден: {item}")
+        picked.update(matches)
+    return picked
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Сводная выгрузка сессий из базы")
+    parser.add_argument("output", type=Path, help="файл .xlsx или папка для Parquet/CSV")
+    parser.add_argument("--format", choices=("parquet", "csv", "xlsx"), help="по умолчанию xlsx для .xlsx, иначе parquet")
+    parser.add_argument("--config", type=Path, default=APP_DIR / "config.json")
+    parser.add_argument("--db", type=Path, default=APP_DIR / "session.sqlite")
+    parser.add_argument("--user", action="append", default=[], help="id или часть ФИО; можно повторять")
+    parser.add_argument("--since", help="начало сессии не раньше, ГГГГ-ММ-ДД[THH:MM:SS]")
+    parser.add_argument("--until", help="начало сессии не позже, ГГГГ-ММ-ДД[THH:MM:SS]")
+    parser.add_argument("--label", choices=LABELS, help="только кадры и сегменты с этой меткой")
+    parser.add_argument("--no-frames", action="store_true", help="без покадровой таблицы")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("xlsx" if args.output.suffix.lower() == ".xlsx" else "parquet")
+    try:
+        since = _date_bound(args.since) if args.since else None
+        until = _date_bound(args.until, end=True) if args.until else None
+    except ValueError as exc:
+        parser.error(f"неверная дата: {exc}")
+
+    if not args.db.is_file():
+        parser.error(f"база не найдена: {args.db}")
+    config = AppConfig.load(args.config)
+    conn = _read_only(args.db)
+    try:
+        try:
+            users = _resolve_users(conn, args.user)
+        except ValueError as exc:
+            parser.error(str(exc))
+        sessions = find_sessions(conn, list(users) if args.user else None, since, until)
+    except sqlite3.Error as exc:
+        parser.error(f"не удалось прочитать базу {args.db}: {exc}")
+    finally:
+        conn.close()
+    if not sessions:
+        print("Сессии не найдены")
+        return 0
+    print(f"Сессий: {len(sessions)}, воркеров: {args.workers}")
+    failed = bulk_export(
+        args.db, sessions, users, args.output, fmt, config.threshold_hi, args.label, not args.no_frames, args.workers
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""Re-score archived session folders with the current model and thresholds.
+
+    python -m app.cli.reanalyze SESSION_DIR [SESSION_DIR ...] [--workers N] [--from-video]
+
+Each session is split into segments that are decoded and scored in
+parallel worker processes; hysteresis is then applied in order and
+``timeline.npz``/``timeline.json`` plus the session's ``labels_over_time``
+rows are rewritten. Sessions recorded with a raw sensor stream are scored
+from it, on the data and timestamps live inference saw. Sessions without
+one are skipped: ``thermal_view.mp4`` holds palette colours, not the
+single-channel intensity live inference scored, so its scores are not
+comparable with the live ones. ``--from-video`` re-scores them from the
+video anyway, with a warning.
+"""
+from __future__ import annotations
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+from app.config import AppConfig
+from app.services.deception import DeceptionService
+from app.storage import Storage
+from app.utils.rawstream import RAW_DIR, RawStreamReader, open_raw_stream
+from app.utils.timeline import Timeline, load_session_timeline, save_timeline
+
+APP_DIR = Path.home() / ".thermodeception"
+
+
+@dataclass
+class SegmentResult:
+    source: str
+    start: int
+    scores: np.ndarray
+    pid: int
+    seconds: float
+
+
+def frame_timestamps(recorded: np.ndarray | None, indices: np.ndarray, frame_rate: int) -> np.ndarray:
+    """Recorded timestamps where the old timeline has them, extrapolated at ``frame_rate`` beyond it."""
+    step = 1000 / frame_rate
+    if recorded is None or not len(recorded):
+        return (indices * step).astype(np.int64)
+    out = np.empty(len(indices), dtype=np.int64)
+    known = indices < len(recorded)
+    out[known] = recorded[indices[known]]
+    out[~known] = recorded[-1] + ((indices[~known] - len(recorded) + 1) * step).astype(np.int64)
+    return out
+
+
+def _video_batches(video: str, first: int, stop: Optional[int], chunk: int) -> Iterator[np.ndarray]:
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open file {video}")
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    batch: List[np.ndarray] = []
+    pos = first
+    try:
+        while stop is None or pos < stop:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            batch.append(frame)
+            pos += 1
+            if len(batch) == chunk:
+                yield np.stack(batch)
+                batch.clear()
+        if batch:
+            yield np.stack(batch)
+    finally:
+        cap.release()
+
+
+def _raw_batches(folder: str, first: int, stop: Optional[int], chunk: int) -> Iterator[np.ndarray]:
+    reader = RawStreamReader(Path(folder))
+    stop = len(reader) if stop is None else min(stop, len(reader))
+    for pos in range(first, stop, chunk):
+        yield reader.frames(pos, min(pos + chunk, stop))
+
+
+def score_segment(
+    source: str,
+    start: int,
+    stop: Optional[int],
+    config: AppConfig,
+    chunk: int,
+    recorded: np.ndarray | None,
+    warmup: int,
+) -> SegmentResult:
+    started = time.perf_counter()
+    service = DeceptionService(config)
+    # decode ``warmup`` extra frames first so the rolling window is full at ``start``
+    first = max(0, start - warmup)
+    batches = _raw_batches if Path(source).name == RAW_DIR else _video_batches
+    parts = []
+    pos = first
+    for batch in batches(source, first, stop, chunk):
+        indices = np.arange(pos, pos + len(batch))
+        parts.append(service.score_batch(batch, frame_timestamps(recorded, indices, config.frame_rate)))
+        pos += len(batch)
+    scores = np.concatenate(parts)[start - first :] if parts else np.empty(0, dtype=np.float32)
+    return SegmentResult(source, start, scores, os.getpid(), time.perf_counter() - started)
+
+
+def _segments(frame_count: int, workers: int, min_frames: int) -> List[tuple[int, Optional[int]]]:
+    size = max(min_frames, -(-frame_count // workers))
+    bounds = list(range(0, frame_count, size)) or [0]
+    # the last segment reads to EOF: CAP_PROP_FRAME_COUNT is only an estimate
+    return [(b, bounds[i + 1] if i + 1 < len(bounds) else None) for i, b in enumerate(bounds)]
+
+
+def reanalyze(
+    folders: List[Path],
+    config: AppConfig,
+    storage: Storage | None,
+    workers: int,
+    chunk: int,
+    min_frames: int,
+    from_video: bool = False,
+) -> int:
+    """Re-scores ``folders``; returns the number of folders skipped."""
+    # offline every frame is scored: there is no frame budget, and gate state
+    # at segment boundaries would make the result depend on the worker count
+    config = replace(config, gate_threshold=0)
+    # with temporal features a segment needs the preceding window; leave a 2x margin for fps jitter
+    warmup = math.ceil(2 * config.window_seconds * config.frame_rate) if config.temporal_features else 0
+    recorded: dict[Path, np.ndarray | None] = {}
+    jobs = []
+    skipped = 0
+    for folder in folders:
+        raw = open_raw_stream(folder)
+        video = folder / "thermal_view.mp4"
+        if raw is not None:
+            # the raw index has the exact capture time of every frame
+            source, frame_count = raw.folder, len(raw)
+            recorded[folder] = raw.timestamps.copy()
+        elif video.exists() and not from_video:
+            print(
+                f"{folder}: нет {RAW_DIR}, пропуск. Видео содержит цвета палитры, а не данные, по которым шла оценка"
+                " при записи; пересчёт по нему (--from-video) не сопоставим с исходными метками",
+                file=sys.stderr,
+            )
+            skipped += 1
+            continue
+        elif video.exists():
+            print(f"ВНИМАНИЕ: {folder}: нет {RAW_DIR}, оценка по цветам thermal_view.mp4 не сопоставима с записью", file=sys.stderr)
+            source = video
+            cap = cv2.VideoCapture(str(video))
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            old = load_session_timeline(folder)
+            recorded[folder] = old.timestamps.copy() if old is not None else None
+        else:
+            print(f"{folder}: нет {RAW_DIR} и thermal_view.mp4, пропуск", file=sys.stderr)
+            skipped += 1
+            continue
+        for start, stop in _segments(frame_count, workers, min_frames):
+            jobs.append((folder, str(source), start, stop))
+
+    results: dict[Path, List[SegmentResult]] = {}
+    per_worker: dict[int, list[float]] = {}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (folder, pool.submit(score_segment, source, start, stop, config, chunk, recorded[folder], warmup))
+            for folder, source, start, stop in jobs
+        ]
+        for folder, future in futures:
+            res = future.result()
+            results.setdefault(folder, []).append(res)
+            stat = per_worker.setdefault(res.pid, [0, 0.0])
+            stat[0] += len(res.scores)
+            stat[1] += res.seconds
+    elapsed = time.perf_counter() - started
+
+    total = 0
+    for folder, parts in results.items():
+        parts.sort(key=lambda r: r.start)
+        scores = np.concatenate([r.scores for r in parts])
+        timestamps = frame_timestamps(recorded[folder], np.arange(len(scores)), config.frame_rate)
+        labels = DeceptionService(config).label_scores(scores, timestamps.tolist())
+        timeline = Timeline.from_arrays(timestamps, scores, labels)
+        save_timeline(timeline, folder / "timeline.npz")
+        if config.timeline_json or (folder / "timeline.json").exists():
+            save_timeline(timeline, folder / "timeline.json")
+        session_id = storage.find_session(folder) if storage else None
+        if session_id is not None:
+            storage.replace_labels(session_id, zip(timestamps.tolist(), scores.tolist(), labels))
+        total += len(timeline)
+        print(f"{folder}: {len(timeline)} кадров, session_id={session_id}")
+
+    for pid, (frames, seconds) in sorted(per_worker.items()):
+        print(f"worker {pid}: {frames} кадров, {frames / seconds if seconds else 0:.1f} кадр/с")
+    print(f"Итого: {total} кадров за {elapsed:.1f} с ({total / elapsed if elapsed else 0:.1f} кадр/с)")
+    return skipped
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Пересчёт таймлайна сохранённых сессий")
+    parser.add_argument("folders", nargs="+", type=Path, help="папки сессий с thermal_raw или thermal_view.mp4")
+    parser.add_argument("--config", type=Path, default=APP_DIR / "config.json")
+    parser.add_argument("--db", type=Path, default=APP_DIR / "session.sqlite")
+    parser.add_argument("--no-db", action="store_true", help="не обновлять labels_over_time")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=256, help="кадров в одном пакете инференса")
+    parser.add_argument(
+        "--from-video", action="store_true", help="пересчитывать сессии без thermal_raw по thermal_view.mp4 (несопоставимо)"
+    )
+    parser.add_argument("--min-segment", type=int, default=500, help="минимум кадров на сегмент воркера")
+    args = parser.parse_args(argv)
+
+    config = AppConfig.load(args.config)
+    storage = None if args.no_db else Storage(args.db)
+    try:
+        skipped = reanalyze(args.folders, config, storage, args.workers, args.chunk, args.min_segment, args.from_video)
+    finally:
+        if storage:
+            storage.close()
+    return 1 if skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Rebuild an interrupted session from its crash journal.
+
+    python -m app.cli.recover SESSION_DIR [SESSION_DIR ...]
+
+Reads ``timeline.journal`` and ``segments.jsonl`` written during recording,
+writes ``timeline.npz``/``timeline.json`` and ``segments.json`` and replaces
+the session's ``labels_over_time`` and ``segments`` rows in the database.
+"""
+from __future__ import annotations
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from app.config import AppConfig
+from app.storage import Storage
+from app.utils.journal import SEGMENTS_JOURNAL, TIMELINE_JOURNAL, read_segment_journal, read_timeline_journal
+from app.utils.timeline import save_segments, save_timeline
+
+APP_DIR = Path.home() / ".thermodeception"
+
+
+def recover(folder: Path, config: AppConfig, storage: Storage | None) -> bool:
+    journal = folder / TIMELINE_JOURNAL
+    if not journal.exists():
+        print(f"{folder}: журнал не найден", file=sys.stderr)
+        return False
+    timeline = read_timeline_journal(journal)
+    save_timeline(timeline, folder / "timeline.npz")
+    if config.timeline_json:
+        save_timeline(timeline, folder / "timeline.json")
+
+    last_ms = int(timeline.timestamps[-1]) if len(timeline) else None
+    segments_path = folder / SEGMENTS_JOURNAL
+    segments = read_segment_journal(segments_path, end_ms=last_ms) if segments_path.exists() else []
+    save_segments([seg.entry for seg in segments], folder / "segments.json")
+
+    session_id = storage.find_session(folder) if storage else None
+    if session_id is not None:
+        storage.replace_labels(session_id, zip(timeline.timestamps.tolist(), timeline.scores.tolist(), timeline.labels()))
+        storage.replace_segments(
+            session_id,
+            (
+                (seg.entry.type, seg.question_id, seg.entry.start_ms, seg.entry.end_ms, seg.entry.label, seg.entry.notes)
+                for seg in segments
+            ),
+        )
+        session = storage.get_session(session_id)
+        if session and not session.finished_at:
+            # the journal's last write is the closest thing to a stop time we have
+            finished = datetime.fromtimestamp(journal.stat().st_mtime).isoformat(timespec="seconds")
+            storage.finish_session(session_id, finished)
+    print(f"{folder}: восстановлено {len(timeline)} кадров, {len(segments)} сегментов, session_id={session_id}")
+    return True
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Восстановление прерванной сессии из журнала")
+    parser.add_argument("folders", nargs="+", type=Path, help="папки сессий")
+    parser.add_argument("--config", type=Path, default=APP_DIR / "config.json")
+    parser.add_argument("--db", type=Path, default=APP_DIR / "session.sqlite")
+    parser.add_argument("--no-db", action="store_true", help="не обновлять базу данных")
+    args = parser.parse_args(argv)
+
+    config = AppConfig.load(args.config)
+    storage = None if args.no_db else Storage(args.db)
+    try:
+        ok = [recover(folder, config, storage) for folder in args.folders]
+    finally:
+        if storage:
+            storage.close()
+    return 0 if all(ok) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
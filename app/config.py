@@ -8,14 +8,64 @@ DEFAULT_CONFIG = {
         "threshold_hi": 0.65,
         "threshold_lo": 0.35,
         "window_seconds": 3.0,
+        "temporal_features": True,
+        "region_features": True,
+        "gate_threshold": 0.01,
+        "gate_refresh_frames": 15,
     },
     "model": {
+        "backend": "logistic",
         "weights": [1.2, -0.8, 0.4],
         "bias": -0.1,
+        "onnx_path": None,
+        "onnx_output": None,
+        "intra_op_threads": 1,
+        "max_batch": 1,
+        "batch_latency_ms": 20,
     },
     "recording": {
         "frame_rate": 15,
         "audio_rate": 16000,
+        "catch_up_frames": 2,
+        "encoder": "opencv",
+        "ffmpeg_preset": "veryfast",
+        "ffmpeg_crf": 23,
+        "timeline_json": True,
+        "raw": False,
+        "raw_compression": "none",
+        "raw_chunk_frames": 64,
+    },
+    "pipeline": {
+        "capture_queue": 8,
+        "capture_policy": "block",
+        "encode_queue": 64,
+        "encode_policy": "block",
+        "preview_queue": 2,
+        "preview_policy": "drop_oldest",
+    },
+    "replay": {
+        "realtime": True,
+        "loop": True,
+        "prefetch": 8,
+    },
+    "synthetic": {
+        "width": 640,
+        "height": 512,
+        "dtype": "uint16",
+        "fps": 60,
+        "blobs": 3,
+        "noise": 0.05,
+        "seed": 0,
+        "spike_every": 0,
+        "spike_ms": 0,
+        "spike_jitter": False,
+        "realtime": True,
+    },
+    "roi": {
+        "enabled": True,
+        "detect_every": 15,
+        "search_margin": 0.5,
+        "min_match": 0.5,
     },
 }
 
@@ -29,6 +79,48 @@ class AppConfig:
     bias: float
     frame_rate: int
     audio_rate: int
+    temporal_features: bool = True
+    region_features: bool = True
+    gate_threshold: float = 0.01
+    gate_refresh_frames: int = 15
+    model_backend: str = "logistic"
+    onnx_path: str | None = None
+    onnx_output: str | None = None
+    intra_op_threads: int = 1
+    max_batch: int = 1
+    batch_latency_ms: float = 20
+    catch_up_frames: int = 2
+    encoder_backend: str = "opencv"
+    ffmpeg_preset: str = "veryfast"
+    ffmpeg_crf: int = 23
+    timeline_json: bool = True
+    raw_recording: bool = False
+    raw_compression: str = "none"
+    raw_chunk_frames: int = 64
+    capture_queue: int = 8
+    capture_policy: str = "block"
+    encode_queue: int = 64
+    encode_policy: str = "block"
+    preview_queue: int = 2
+    preview_policy: str = "drop_oldest"
+    replay_realtime: bool = True
+    replay_loop: bool = True
+    replay_prefetch: int = 8
+    synthetic_width: int = 640
+    synthetic_height: int = 512
+    synthetic_dtype: str = "uint16"
+    synthetic_fps: float = 60
+    synthetic_blobs: int = 3
+    synthetic_noise: float = 0.05
+    synthetic_seed: int = 0
+    synthetic_spike_every: int = 0
+    synthetic_spike_ms: float = 0
+    synthetic_spike_jitter: bool = False
+    synthetic_realtime: bool = True
+    roi_enabled: bool = True
+    roi_detect_every: int = 15
+    roi_search_margin: float = 0.5
+    roi_min_match: float = 0.5
 
     @classmethod
     def load(cls, path: Path | None = None) -> "AppConfig":
@@ -44,14 +136,60 @@ class AppConfig:
         dec = data["deception"]
         model = data["model"]
         rec = data.get("recording", {})
+        pipe = data.get("pipeline", {})
+        replay = data.get("replay", {})
+        syn = data.get("synthetic", {})
+        roi = data.get("roi", {})
         return cls(
             threshold_hi=dec.get("threshold_hi", 0.65),
             threshold_lo=dec.get("threshold_lo", 0.35),
             window_seconds=dec.get("window_seconds", 3.0),
+            temporal_features=dec.get("temporal_features", True),
+            region_features=dec.get("region_features", True),
+            gate_threshold=dec.get("gate_threshold", 0.01),
+            gate_refresh_frames=dec.get("gate_refresh_frames", 15),
             weights=model.get("weights", [1.0, 1.0, 1.0]),
             bias=model.get("bias", 0.0),
+            model_backend=model.get("backend", "logistic"),
+            onnx_path=model.get("onnx_path"),
+            onnx_output=model.get("onnx_output"),
+            intra_op_threads=model.get("intra_op_threads", 1),
+            max_batch=model.get("max_batch", 1),
+            batch_latency_ms=model.get("batch_latency_ms", 20),
             frame_rate=rec.get("frame_rate", 15),
             audio_rate=rec.get("audio_rate", 16000),
+            catch_up_frames=rec.get("catch_up_frames", 2),
+            encoder_backend=rec.get("encoder", "opencv"),
+            ffmpeg_preset=rec.get("ffmpeg_preset", "veryfast"),
+            ffmpeg_crf=rec.get("ffmpeg_crf", 23),
+            timeline_json=rec.get("timeline_json", True),
+            raw_recording=rec.get("raw", False),
+            raw_compression=rec.get("raw_compression", "none"),
+            raw_chunk_frames=rec.get("raw_chunk_frames", 64),
+            capture_queue=pipe.get("capture_queue", 8),
+            capture_policy=pipe.get("capture_policy", "block"),
+            encode_queue=pipe.get("encode_queue", 64),
+            encode_policy=pipe.get("encode_policy", "block"),
+            preview_queue=pipe.get("preview_queue", 2),
+            preview_policy=pipe.get("preview_policy", "drop_oldest"),
+            replay_realtime=replay.get("realtime", True),
+            replay_loop=replay.get("loop", True),
+            replay_prefetch=replay.get("prefetch", 8),
+            synthetic_width=syn.get("width", 640),
+            synthetic_height=syn.get("height", 512),
+            synthetic_dtype=syn.get("dtype", "uint16"),
+            synthetic_fps=syn.get("fps", 60),
+            synthetic_blobs=syn.get("blobs", 3),
+            synthetic_noise=syn.get("noise", 0.05),
+            synthetic_seed=syn.get("seed", 0),
+            synthetic_spike_every=syn.get("spike_every", 0),
+            synthetic_spike_ms=syn.get("spike_ms", 0),
+            synthetic_spike_jitter=syn.get("spike_jitter", False),
+            synthetic_realtime=syn.get("realtime", True),
+            roi_enabled=roi.get("enabled", True),
+            roi_detect_every=roi.get("detect_every", 15),
+            roi_search_margin=roi.get("search_margin", 0.5),
+            roi_min_match=roi.get("min_match", 0.5),
         )
 
     def save(self, path: Path) -> None:
@@ -60,14 +198,64 @@ class AppConfig:
                 "threshold_hi": self.threshold_hi,
                 "threshold_lo": self.threshold_lo,
                 "window_seconds": self.window_seconds,
+                "temporal_features": self.temporal_features,
+                "region_features": self.region_features,
+                "gate_threshold": self.gate_threshold,
+                "gate_refresh_frames": self.gate_refresh_frames,
             },
             "model": {
+                "backend": self.model_backend,
                 "weights": self.weights,
                 "bias": self.bias,
+                "onnx_path": self.onnx_path,
+                "onnx_output": self.onnx_output,
+                "intra_op_threads": self.intra_op_threads,
+                "max_batch": self.max_batch,
+                "batch_latency_ms": self.batch_latency_ms,
             },
             "recording": {
                 "frame_rate": self.frame_rate,
                 "audio_rate": self.audio_rate,
+                "catch_up_frames": self.catch_up_frames,
+                "encoder": self.encoder_backend,
+                "ffmpeg_preset": self.ffmpeg_preset,
+                "ffmpeg_crf": self.ffmpeg_crf,
+                "timeline_json": self.timeline_json,
+                "raw": self.raw_recording,
+                "raw_compression": self.raw_compression,
+                "raw_chunk_frames": self.raw_chunk_frames,
+            },
+            "pipeline": {
+                "capture_queue": self.capture_queue,
+                "capture_policy": self.capture_policy,
+                "encode_queue": self.encode_queue,
+                "encode_policy": self.encode_policy,
+                "preview_queue": self.preview_queue,
+                "preview_policy": self.preview_policy,
+            },
+            "replay": {
+                "realtime": self.replay_realtime,
+                "loop": self.replay_loop,
+                "prefetch": self.replay_prefetch,
+            },
+            "synthetic": {
+                "width": self.synthetic_width,
+                "height": self.synthetic_height,
+                "dtype": self.synthetic_dtype,
+                "fps": self.synthetic_fps,
+                "blobs": self.synthetic_blobs,
+                "noise": self.synthetic_noise,
+                "seed": self.synthetic_seed,
+                "spike_every": self.synthetic_spike_every,
+                "spike_ms": self.synthetic_spike_ms,
+                "spike_jitter": self.synthetic_spike_jitter,
+                "realtime": self.synthetic_realtime,
+            },
+            "roi": {
+                "enabled": self.roi_enabled,
+                "detect_every": self.roi_detect_every,
+                "search_margin": self.roi_search_margin,
+                "min_match": self.roi_min_match,
             },
         }, indent=2))
 
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import logging
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from app.config import AppConfig
+
+
+class ModelBackend:
+    """Maps an (N, F) float32 feature matrix to N scores in [0, 1]."""
+
+    def predict(self, feats: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def warmup(self, n_features: int, batch: int = 1, runs: int = 3):
+        dummy = np.zeros((batch, n_features), dtype=np.float32)
+        for _ in range(runs):
+            self.predict(dummy)
+
+    def close(self):
+        pass
+
+
+class LogisticBackend(ModelBackend):
+    """The built-in logistic regression over ``model.weights``/``model.bias``.
+
+    Weights shorter than the feature vector are padded with zeros.
+    """
+
+    def __init__(self, weights: List[float], bias: float, n_features: int):
+        if len(weights) > n_features:
+            raise ValueError(f"model.weights has {len(weights)} values, the model has {n_features} inputs")
+        self.weights = np.zeros(n_features, dtype=np.float32)
+        self.weights[: len(weights)] = weights
+        self.bias = np.float32(bias)
+
+    def predict(self, feats: np.ndarray) -> np.ndarray:
+        z = feats @ self.weights + self.bias
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-z))
+
+    def warmup(self, n_features: int, batch: int = 1, runs: int = 3):
+        pass  # nothing to initialise
+
+
+class OnnxBackend(ModelBackend):
+    """ONNX Runtime CPU session over a local ``.onnx`` file.
+
+    The model takes one float32 (N, F) input. Its output is either (N,)
+    scores or (N, 2) class probabilities, in which case column 1 is used.
+    """
+
+    def __init__(self, path: Path, intra_op_threads: int = 1, output_name: str | None = None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("onnxruntime is not installed: pip install onnxruntime") from None
+        if not path.exists():
+            raise RuntimeError(f"ONNX model not found: {path}")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        started = time.perf_counter()
+        self.session = ort.InferenceSession(str(path), sess_options=options, providers=["CPUExecutionProvider"])
+        logging.info("ONNX model %s loaded in %.2f s", path, time.perf_counter() - started)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = output_name or self.session.get_outputs()[0].name
+
+    def predict(self, feats: np.ndarray) -> np.ndarray:
+        out = self.session.run([self.output_name], {self.input_name: np.ascontiguousarray(feats, dtype=np.float32)})[0]
+        out = np.asarray(out, dtype=np.float32)
+        if out.ndim == 2 and out.shape[1] == 2:
+            return out[:, 1]
+        return out.reshape(len(feats))
+
+    def close(self):
+        self.session = None
+
+
+def create_backend(config: AppConfig, n_features: int) -> ModelBackend:
+    if config.model_backend == "logistic":
+        return LogisticBackend(config.weights, config.bias, n_features)
+    if config.model_backend == "onnx":
+        if not config.onnx_path:
+            raise ValueError("model.onnx_path is required for the onnx backend")
+        return OnnxBackend(Path(config.onnx_path).expanduser(), config.intra_op_threads, config.onnx_output)
+    raise ValueError(f"Unknown model backend: {config.model_backend}")
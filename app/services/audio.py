@@ -1,6 +1,7 @@
 from __future__ import annotations
 import queue
 import threading
+import time
 import sounddevice as sd
 import soundfile as sf
 from dataclasses import dataclass
@@ -21,6 +22,8 @@ class AudioRecorder:
         self._stream: Optional[sd.InputStream] = None
         self._file: Optional[sf.SoundFile] = None
         self._running = False
+        # session clock (monotonic ms) of the first sample, for aligning playback with frames
+        self.started_ms: Optional[int] = None
         self.level_callback: Optional[Callable[[float], None]] = None
 
     def list_devices(self) -> list[AudioDevice]:
@@ -43,6 +46,7 @@ class AudioRecorder:
                 self.level_callback(level)
 
         self._stream = sd.InputStream(samplerate=self.samplerate, channels=self.channels, device=device_index, callback=callback)
+        self.started_ms = int(time.monotonic() * 1000)
         self._stream.start()
         threading.Thread(target=self._writer, daemon=True).start()
 
@@ -0,0 +1,83 @@
+from __future__ import annotations
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+Key = Tuple[Tuple[int, ...], str]
+
+
+class FramePool:
+    """Reusable frame arrays handed out by an adapter and returned by the last consumer.
+
+    Arrays are kept in free lists keyed by shape and dtype. ``acquire`` never
+    blocks: when no array is free a new one is allocated, so a consumer that
+    forgets to release costs an allocation, not a stall. At most ``max_free``
+    arrays per key are kept for reuse; extra returns are left to the GC.
+    """
+
+    def __init__(self, max_free: int = 32):
+        self.max_free = max_free
+        self.allocated = 0
+        self.reused = 0
+        self.released = 0
+        self._free: Dict[Key, List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reused += 1
+                return free.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, array: np.ndarray):
+        key = (array.shape, array.dtype.str)
+        with self._lock:
+            self.released += 1
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_free:
+                free.append(array)
+
+    def stats(self) -> dict:
+        with self._lock:
+            acquired = self.allocated + self.reused
+            return {
+                "allocated": self.allocated,
+                "reused": self.reused,
+                "outstanding": acquired - self.released,
+                "free": sum(len(free) for free in self._free.values()),
+            }
+
+
+class ScratchBuffers:
+    """Named intermediate arrays private to one stage, reused on every call.
+
+    ``get`` returns the buffer for ``name``, reallocating only when the shape
+    or dtype changes. ``keep`` stores an array OpenCV returned in place of the
+    one passed as ``dst``/``image`` and counts it as an allocation if it is a
+    new object.
+    """
+
+    def __init__(self):
+        self.allocations = 0
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = self._buffers[name] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return buf
+
+    def last(self, name: str) -> Optional[np.ndarray]:
+        return self._buffers.get(name)
+
+    def keep(self, name: str, array: np.ndarray) -> np.ndarray:
+        if self._buffers.get(name) is not array:
+            self._buffers[name] = array
+            self.allocations += 1
+        return array
@@ -1,32 +1,140 @@
 from __future__ import annotations
 import numpy as np
 from collections import deque
-from typing import Deque, Tuple
+from typing import Deque, List, Sequence, Tuple
 
 from app.config import AppConfig
+from app.models.backends import create_backend
+from app.services.features import BASE_FEATURES, RegionFeatureExtractor, RollingWindowStats
+from app.services.gating import ChangeGate
+from app.services.roi import RoiTracker, center_roi
 from app.services.thermal_adapters import ThermalFrame
 
+N_FRAME_FEATURES = len(BASE_FEATURES)
+
 
 class DeceptionService:
+    """Per-frame features plus rolling ``window_seconds`` statistics -> model score.
+
+    Model inputs are the instantaneous region features, followed when
+    ``temporal_features`` is on by their rolling mean/var/slope/min/max,
+    followed when ``region_features`` is on by mean/std of the forehead,
+    periorbital, nose and cheek sub-regions. The model itself is a
+    pluggable backend (``model.backend``).
+    Features come from the tracked face region when ``roi.enabled`` is on,
+    otherwise from the centre of the frame. With ``gate_threshold`` > 0
+    frames that barely differ from the last scored one reuse its score;
+    ``last_computed`` tells which frames of the last call were scored.
+    """
+
     def __init__(self, config: AppConfig):
         self.config = config
         self.history: Deque[Tuple[float, float]] = deque(maxlen=120)
         self.current_label = "Правда"
+        self.temporal = RollingWindowStats(config.window_seconds * 1000, N_FRAME_FEATURES) if config.temporal_features else None
+        self.extractor = RegionFeatureExtractor(None if config.region_features else {})
+        self.n_inputs = self.extractor.size + (self.temporal.size if self.temporal else 0)
+        self.model = create_backend(config, self.n_inputs)
+        self.roi_tracker = (
+            RoiTracker(config.roi_detect_every, config.roi_search_margin, config.roi_min_match)
+            if config.roi_enabled
+            else None
+        )
+        self.gate = ChangeGate(config.gate_threshold, config.gate_refresh_frames) if config.gate_threshold > 0 else None
+        self.last_computed = np.ones(0, dtype=bool)
+        self._last_score = 0.0
+
+    def warmup(self):
+        """Pays the backend's first-run cost before the first real frame arrives."""
+        self.model.warmup(self.n_inputs, batch=max(1, self.config.max_batch))
+
+    def frame_data(self, frame: ThermalFrame) -> np.ndarray:
+        return frame.temperature_matrix if frame.temperature_matrix is not None else frame.frame
+
+    def stats(self) -> dict:
+        return {
+            "roi": self.roi_tracker.stats() if self.roi_tracker is not None else None,
+            "gating": self.gate.stats() if self.gate is not None else None,
+        }
+
+    def _region(self, img: np.ndarray) -> tuple[int, int, int, int]:
+        return self.roi_tracker.update(img) if self.roi_tracker is not None else center_roi(img.shape)
 
     def _extract_features(self, frame: ThermalFrame) -> np.ndarray:
-        img = frame.temperature_matrix if frame.temperature_matrix is not None else frame.frame
-        gray = img if len(img.shape) == 2 else np.mean(img, axis=2)
-        center_slice = gray[gray.shape[0] // 4 : gray.shape[0] * 3 // 4, gray.shape[1] // 4 : gray.shape[1] * 3 // 4]
-        mean_val = float(np.mean(center_slice))
-        std_val = float(np.std(center_slice))
-        gradient = float(np.mean(np.abs(np.gradient(center_slice))))
-        return np.array([mean_val, std_val, gradient], dtype=float)
+        img = self.frame_data(frame)
+        return self.extractor(self._region_gray(img, self._region(img)))
+
+    def _extract_features_batch(self, frames: np.ndarray) -> np.ndarray:
+        """Same features as ``_extract_features`` for an (N,H,W[,C]) stack."""
+        frames = np.asarray(frames)
+        if self.roi_tracker is not None:
+            # the tracker is sequential and regions differ in size, so go frame by frame
+            return np.stack([self.extractor(self._region_gray(img, self._region(img))) for img in frames])
+        return self.extractor.batch(self._region_gray(frames, center_roi(frames.shape[1:]), stacked=True))
+
+    @staticmethod
+    def _region_gray(img: np.ndarray, roi: tuple[int, int, int, int], stacked: bool = False) -> np.ndarray:
+        x, y, w, h = roi
+        region = img[:, y : y + h, x : x + w] if stacked else img[y : y + h, x : x + w]
+        # crop before the channel mean so only the region is converted
+        if region.ndim == (4 if stacked else 3):
+            return region.mean(axis=-1, dtype=np.float32)
+        return region.astype(np.float32)
+
+    def _model_inputs(self, feats: np.ndarray, temporal: np.ndarray | None) -> np.ndarray:
+        if temporal is None:
+            return feats
+        return np.concatenate([feats[:, :N_FRAME_FEATURES], temporal.astype(np.float32), feats[:, N_FRAME_FEATURES:]], axis=1)
+
+    def score_batch(self, frames: np.ndarray, timestamps: Sequence[int]) -> np.ndarray:
+        """Logistic scores for a frame stack.
+
+        Advances the rolling window and the change gate like the same number
+        of ``infer`` calls but leaves the label state alone.
+        """
+        frames = np.asarray(frames)
+        computed = self.gate.check_batch(frames) if self.gate is not None else np.ones(len(frames), dtype=bool)
+        self.last_computed = computed
+        if not computed.any():
+            return np.full(len(frames), self._last_score, dtype=np.float32)
+        if not computed.all():
+            frames = frames[computed]
+            timestamps = np.asarray(timestamps)[computed]
+        feats = self._extract_features_batch(frames)
+        temporal = None
+        if self.temporal is not None:
+            temporal = self.temporal.update_batch(np.asarray(timestamps), feats[:, :N_FRAME_FEATURES])
+        fresh = self.model.predict(self._model_inputs(feats, temporal))
+        # carry each computed score forward over the skipped frames after it
+        source = np.maximum.accumulate(np.where(computed, np.cumsum(computed) - 1, -1))
+        scores = np.where(source >= 0, fresh[np.maximum(source, 0)], self._last_score).astype(np.float32)
+        self._last_score = float(scores[-1])
+        return scores
+
+    def label_scores(self, scores: Sequence[float], timestamps: Sequence[int]) -> List[str]:
+        """Runs the hysteresis over scores in order, as repeated ``infer`` calls would."""
+        labels = []
+        for ts, p in zip(timestamps, scores):
+            p = float(p)
+            self.history.append((ts, p))
+            self._update_label(p)
+            labels.append(self.current_label)
+        return labels
+
+    def infer_batch(self, frames: np.ndarray, timestamps: Sequence[int]) -> tuple[List[str], np.ndarray]:
+        scores = self.score_batch(frames, timestamps)
+        return self.label_scores(scores, timestamps), scores
 
     def infer(self, frame: ThermalFrame, timestamp_ms: int) -> tuple[str, float]:
-        feats = self._extract_features(frame)
-        weights = np.array(self.config.weights)
-        z = float(np.dot(feats, weights) + self.config.bias)
-        p = 1.0 / (1.0 + np.exp(-z))
+        computed = self.gate is None or self.gate.check(self.frame_data(frame))
+        self.last_computed = np.array([computed])
+        if computed:
+            feats = self._extract_features(frame)[None]
+            temporal = None
+            if self.temporal is not None:
+                temporal = self.temporal.update(timestamp_ms, feats[0, :N_FRAME_FEATURES])[None]
+            self._last_score = float(self.model.predict(self._model_inputs(feats, temporal))[0])
+        p = self._last_score
         self.history.append((timestamp_ms, p))
         self._update_label(p)
         return self.current_label, p
@@ -0,0 +1,223 @@
+from __future__ import annotations
+import logging
+from array import array
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.config import AppConfig
+from app.services.queues import BLOCK, QueueClosed, RingQueue
+from app.services.thermal_adapters import ThermalFrame
+
+
+def ffmpeg_executable() -> str:
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        exe = shutil.which("ffmpeg")
+        if not exe:
+            raise RuntimeError("ffmpeg not found: install imageio-ffmpeg or add ffmpeg to PATH")
+        return exe
+
+
+class EncoderBackend:
+    """Base class for video file writers used by VideoEncoder."""
+
+    def open(self, path: Path, fps: float, size: Tuple[int, int]):
+        raise NotImplementedError
+
+    def write(self, frame: np.ndarray):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class OpenCVBackend(EncoderBackend):
+    """cv2.VideoWriter, H264 with a fallback to mp4v."""
+
+    def __init__(self):
+        self.writer: Optional[cv2.VideoWriter] = None
+
+    def open(self, path: Path, fps: float, size: Tuple[int, int]):
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'H264'), fps, size)
+        if not writer.isOpened():
+            writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+        if not writer.isOpened():
+            raise RuntimeError(f"Cannot open video writer {path}")
+        self.writer = writer
+
+    def write(self, frame: np.ndarray):
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer:
+            self.writer.release()
+            self.writer = None
+
+
+class FfmpegPipeBackend(EncoderBackend):
+    """Pipes raw BGR frames to an ffmpeg libx264 subprocess."""
+
+    def __init__(self, preset: str = "veryfast", crf: int = 23):
+        self.preset = preset
+        self.crf = crf
+        self.proc: Optional[subprocess.Popen] = None
+
+    def open(self, path: Path, fps: float, size: Tuple[int, int]):
+        w, h = size
+        cmd = [
+            ffmpeg_executable(),
+            "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{w}x{h}", "-r", str(fps),
+            "-i", "-",
+            # yuv420p needs even dimensions
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf), "-pix_fmt", "yuv420p",
+            # a keyframe every 2 s bounds how much the review player decodes after a seek
+            "-g", str(max(1, round(2 * fps))),
+            str(path),
+        ]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame: np.ndarray):
+        try:
+            self.proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg exited: {self._stderr()}") from None
+
+    def close(self):
+        if not self.proc:
+            return
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        code = self.proc.wait()
+        stderr = self._stderr()
+        self.proc = None
+        if code != 0:
+            raise RuntimeError(f"ffmpeg failed ({code}): {stderr}")
+
+    def _stderr(self) -> str:
+        if not self.proc or not self.proc.stderr:
+            return ""
+        return self.proc.stderr.read().decode(errors="replace").strip()
+
+
+class VideoEncoder:
+    """Writes frames to a video file from its own thread.
+
+    Items arrive through ``queue`` as ``(frame, ts_ms)`` pairs; frames are
+    BGR arrays or ``ThermalFrame``s, which are coloured into a reused buffer
+    here and released once written; the backend is opened lazily with the
+    size of the first frame. ``timestamps`` holds the capture time of every
+    frame actually written, so frames dropped from the queue or lost to an
+    encoder error do not shift the video against the session clock.
+    ``stats`` reports the encoder's own throughput, independent of capture
+    and inference.
+    """
+
+    def __init__(self, path: Path, fps: float, backend: EncoderBackend, queue_size: int = 64, policy: str = BLOCK):
+        self.path = path
+        self.fps = fps
+        self.backend = backend
+        self.queue = RingQueue("encode", queue_size, policy)
+        self.queue.on_drop = _release
+        self.frames = 0
+        self._written_ms = array("q")
+        self.encode_seconds = 0.0
+        self.error: Optional[str] = None
+        self._opened = False
+        self._color: Optional[np.ndarray] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame: np.ndarray | ThermalFrame, ts_ms: int, timeout: float | None = None) -> bool:
+        return self.queue.put((frame, ts_ms), timeout)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Capture time of each written video frame; complete once ``close`` has returned."""
+        return np.frombuffer(self._written_ms, dtype=np.int64).copy()
+
+    def close(self, timeout: float | None = None):
+        self.queue.close()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    item = self.queue.get()
+                except QueueClosed:
+                    break
+                started = time.perf_counter()
+                frame, ts_ms = item
+                try:
+                    frame = self._color_frame(frame) if isinstance(frame, ThermalFrame) else frame
+                    if not self._opened:
+                        h, w = frame.shape[:2]
+                        self.backend.open(self.path, self.fps, (w, h))
+                        self._opened = True
+                    self.backend.write(frame)
+                    self._written_ms.append(ts_ms)
+                finally:
+                    _release(item)
+                self.encode_seconds += time.perf_counter() - started
+                self.frames += 1
+        except Exception as exc:
+            logging.exception("Video encoder failed")
+            self.error = str(exc)
+            self.queue.close()
+        finally:
+            # ffmpeg drains its pipe on close, so that time counts as encoding too
+            started = time.perf_counter()
+            try:
+                self.backend.close()
+                self.encode_seconds += time.perf_counter() - started
+            except Exception as exc:
+                logging.exception("Video encoder close failed")
+                self.error = self.error or str(exc)
+
+    def _color_frame(self, item: ThermalFrame) -> np.ndarray:
+        frame = item.render(dst=self._color)
+        if frame is not item.frame:
+            self._color = frame
+        return frame
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "frames": self.frames,
+            "encode_seconds": self.encode_seconds,
+            "encode_fps": self.frames / self.encode_seconds if self.encode_seconds else 0.0,
+            "queue": self.queue.stats(),
+        }
+
+
+def _release(item: tuple):
+    if isinstance(item[0], ThermalFrame):
+        item[0].release()
+
+
+def create_encoder(path: Path, config: AppConfig) -> VideoEncoder:
+    if config.encoder_backend == "ffmpeg":
+        backend: EncoderBackend = FfmpegPipeBackend(config.ffmpeg_preset, config.ffmpeg_crf)
+    elif config.encoder_backend == "opencv":
+        backend = OpenCVBackend()
+    else:
+        raise ValueError(f"Unknown encoder backend: {config.encoder_backend}")
+    return VideoEncoder(path, config.frame_rate, backend, config.encode_queue, config.encode_policy)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+import operator
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+TEMPORAL_STATS = ("mean", "var", "slope", "min", "max")
+BASE_FEATURES = ("mean", "std", "gradient")
+
+# x, y, w, h as fractions of the face region
+FACE_REGIONS: Dict[str, Tuple[float, float, float, float]] = {
+    "forehead": (0.2, 0.0, 0.6, 0.25),
+    "periorbital": (0.15, 0.25, 0.7, 0.15),
+    "nose": (0.4, 0.4, 0.2, 0.25),
+    "left_cheek": (0.1, 0.5, 0.25, 0.25),
+    "right_cheek": (0.65, 0.5, 0.25, 0.25),
+}
+
+
+def summed_area_tables(gray: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Zero-padded sum and sum-of-squares tables, (...,H,W) -> (...,H+1,W+1) float64."""
+    if gray.ndim == 2:
+        return cv2.integral2(gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    gray = gray.astype(np.float64)
+    pad = [(0, 0)] * (gray.ndim - 2) + [(1, 0), (1, 0)]
+    sat = np.pad(gray.cumsum(axis=-2).cumsum(axis=-1), pad)
+    sqsat = np.pad((gray * gray).cumsum(axis=-2).cumsum(axis=-1), pad)
+    return sat, sqsat
+
+
+def rect_mean_std(sat: np.ndarray, sqsat: np.ndarray, rects: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and std inside each (x0, y0, x1, y1) rectangle, four lookups per table."""
+    x0, y0, x1, y1 = rects.T
+
+    def rect_sum(table):
+        return table[..., y1, x1] - table[..., y0, x1] - table[..., y1, x0] + table[..., y0, x0]
+
+    n = ((x1 - x0) * (y1 - y0)).astype(np.float64)
+    mean = rect_sum(sat) / n
+    var = np.maximum(rect_sum(sqsat) / n - mean * mean, 0.0)
+    return mean, np.sqrt(var)
+
+
+class RegionFeatureExtractor:
+    """Per-frame features of a face region and of its sub-regions.
+
+    One pair of summed-area tables per frame gives mean and std for the
+    whole region and every sub-region at constant cost each. The float32
+    vector is laid out as ``BASE_FEATURES`` (mean, std, mean absolute
+    gradient of the whole region) followed by mean and std of each entry
+    of ``regions`` in order.
+    """
+
+    def __init__(self, regions: Dict[str, Tuple[float, float, float, float]] | None = None):
+        self.regions = dict(FACE_REGIONS if regions is None else regions)
+        self.size = len(BASE_FEATURES) + 2 * len(self.regions)
+        self._rects: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def names(self) -> List[str]:
+        return list(BASE_FEATURES) + [f"{name}_{stat}" for name in self.regions for stat in ("mean", "std")]
+
+    def __call__(self, gray: np.ndarray) -> np.ndarray:
+        return self.batch(gray[None])[0]
+
+    def batch(self, grays: np.ndarray) -> np.ndarray:
+        """(N,H,W) float32 regions -> (N, size) float32 features."""
+        h, w = grays.shape[-2:]
+        if len(grays) == 1:
+            sat, sqsat = (table[None] for table in summed_area_tables(grays[0]))
+        else:
+            sat, sqsat = summed_area_tables(grays)
+        mean, std = rect_mean_std(sat, sqsat, self._rects_for(h, w))
+        grad_y, grad_x = np.gradient(grays, axis=(-2, -1))
+        gradient = (np.abs(grad_y).mean(axis=(-2, -1)) + np.abs(grad_x).mean(axis=(-2, -1))) / 2
+        out = np.empty((len(grays), self.size), dtype=np.float32)
+        out[:, 0] = mean[:, 0]
+        out[:, 1] = std[:, 0]
+        out[:, 2] = gradient
+        out[:, 3::2] = mean[:, 1:]
+        out[:, 4::2] = std[:, 1:]
+        return out
+
+    def _rects_for(self, h: int, w: int) -> np.ndarray:
+        # pixel rectangles only change when the region size does, so cache them
+        rects = self._rects.get((h, w))
+        if rects is None:
+            if len(self._rects) > 64:
+                self._rects.clear()
+            rows = [(0, 0, w, h)]
+            for fx, fy, fw, fh in self.regions.values():
+                x0, y0 = min(int(fx * w), w - 1), min(int(fy * h), h - 1)
+                rows.append((x0, y0, max(x0 + 1, min(w, int(round((fx + fw) * w)))), max(y0 + 1, min(h, int(round((fy + fh) * h))))))
+            rects = self._rects[(h, w)] = np.array(rows, dtype=np.intp)
+        return rects
+
+
+class RollingWindowStats:
+    """Rolling mean, variance, slope and min/max of a feature vector over a time window.
+
+    Samples older than ``window_ms`` relative to the newest one are evicted.
+    Mean, variance and slope (per second) come from running sums, min/max
+    from monotonic deques, so each update costs O(1) amortised regardless
+    of the window length. ``update`` returns the statistics grouped by
+    statistic: all means, then all variances, and so on.
+    """
+
+    def __init__(self, window_ms: float, n_features: int):
+        self.window_ms = window_ms
+        self.n_features = n_features
+        self.size = len(TEMPORAL_STATS) * n_features
+        self._t0: int | None = None
+        self._reset()
+
+    def _reset(self):
+        n = self.n_features
+        self._samples: Deque[Tuple[int, float, np.ndarray]] = deque()
+        self._s_t = 0.0
+        self._s_tt = 0.0
+        self._s_x = np.zeros(n)
+        self._s_xx = np.zeros(n)
+        self._s_tx = np.zeros(n)
+        self._min: List[Deque[Tuple[int, float]]] = [deque() for _ in range(n)]
+        self._max: List[Deque[Tuple[int, float]]] = [deque() for _ in range(n)]
+
+    def update(self, timestamp_ms: int, x: np.ndarray) -> np.ndarray:
+        if self._t0 is None:
+            self._t0 = timestamp_ms
+        x = np.asarray(x, dtype=np.float64)
+        t = (timestamp_ms - self._t0) / 1000.0
+        self._samples.append((timestamp_ms, t, x))
+        self._s_t += t
+        self._s_tt += t * t
+        self._s_x += x
+        self._s_xx += x * x
+        self._s_tx += t * x
+        for i, value in enumerate(x.tolist()):
+            mins, maxs = self._min[i], self._max[i]
+            while mins and mins[-1][1] >= value:
+                mins.pop()
+            mins.append((timestamp_ms, value))
+            while maxs and maxs[-1][1] <= value:
+                maxs.pop()
+            maxs.append((timestamp_ms, value))
+        self._evict(timestamp_ms - self.window_ms)
+        return self._stats()
+
+    def update_batch(self, timestamps: np.ndarray, feats: np.ndarray) -> np.ndarray:
+        """Vectorised equivalent of calling ``update`` for every row, (N,F) -> (N,5F)."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        feats = np.asarray(feats, dtype=np.float64)
+        if len(timestamps) == 0:
+            return np.empty((0, self.size))
+        if self._t0 is None:
+            self._t0 = int(timestamps[0])
+        # prepend what is still inside the window so the first rows see their history
+        history = len(self._samples)
+        if history:
+            timestamps = np.concatenate([np.array([s[0] for s in self._samples], dtype=np.int64), timestamps])
+            feats = np.concatenate([np.stack([s[2] for s in self._samples]), feats])
+        t = (timestamps - self._t0) / 1000.0
+        starts = np.searchsorted(timestamps, timestamps - self.window_ms, side="right")
+        ends = np.arange(1, len(t) + 1)
+
+        def window_sum(values: np.ndarray) -> np.ndarray:
+            csum = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+            return csum[ends] - csum[starts]
+
+        n = (ends - starts).astype(np.float64)
+        s_t = window_sum(t)
+        s_tt = window_sum(t * t)
+        s_x = window_sum(feats)
+        s_xx = window_sum(feats * feats)
+        s_tx = window_sum(t[:, None] * feats)
+        mins = self._sliding_extreme(timestamps, feats, operator.le)
+        maxs = self._sliding_extreme(timestamps, feats, operator.ge)
+        stats = self._combine(n[:, None], s_t[:, None], s_tt[:, None], s_x, s_xx, s_tx, mins, maxs)[history:]
+
+        # rebuild the incremental state from the tail of the window
+        self._reset()
+        tail = int(np.searchsorted(timestamps, timestamps[-1] - self.window_ms, side="right"))
+        for ts, x in zip(timestamps[tail:].tolist(), feats[tail:]):
+            self.update(ts, x)
+        return stats
+
+    def _sliding_extreme(self, timestamps: np.ndarray, feats: np.ndarray, keep) -> np.ndarray:
+        out = np.empty_like(feats)
+        ts_list = timestamps.tolist()
+        for j in range(feats.shape[1]):
+            column = feats[:, j].tolist()
+            window: Deque[int] = deque()
+            for i, value in enumerate(column):
+                while window and not keep(column[window[-1]], value):
+                    window.pop()
+                window.append(i)
+                while ts_list[window[0]] <= ts_list[i] - self.window_ms:
+                    window.popleft()
+                out[i, j] = column[window[0]]
+        return out
+
+    def _evict(self, cutoff: float):
+        while self._samples and self._samples[0][0] <= cutoff:
+            _, t, x = self._samples.popleft()
+            self._s_t -= t
+            self._s_tt -= t * t
+            self._s_x -= x
+            self._s_xx -= x * x
+            self._s_tx -= t * x
+        for dq in self._min + self._max:
+            while dq and dq[0][0] <= cutoff:
+                dq.popleft()
+
+    def _stats(self) -> np.ndarray:
+        mins = np.array([dq[0][1] for dq in self._min])
+        maxs = np.array([dq[0][1] for dq in self._max])
+        return self._combine(
+            float(len(self._samples)), self._s_t, self._s_tt, self._s_x, self._s_xx, self._s_tx, mins, maxs
+        )
+
+    @staticmethod
+    def _combine(n, s_t, s_tt, s_x, s_xx, s_tx, mins, maxs) -> np.ndarray:
+        mean = s_x / n
+        var = np.maximum(s_xx / n - mean * mean, 0.0)
+        t_var = s_tt / n - (s_t / n) ** 2
+        cov = s_tx / n - (s_t / n) * mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(t_var > 1e-9, cov / t_var, 0.0)
+        return np.concatenate(np.broadcast_arrays(mean, var, slope, mins, maxs), axis=-1)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class ChangeGate:
+    """Decides whether a frame changed enough since the last scored one.
+
+    Frames are reduced to a ``size`` thumbnail; the change metric is the mean
+    absolute difference to the thumbnail of the last scored frame, relative
+    to that thumbnail's value range, so the same ``threshold`` works for
+    8-bit images and temperature matrices. Comparing against the last scored
+    frame rather than the previous one lets slow drift add up. Every
+    ``refresh_every`` frames a frame is scored regardless.
+    """
+
+    def __init__(self, threshold: float, refresh_every: int = 15, size: Tuple[int, int] = (32, 24)):
+        self.threshold = threshold
+        self.refresh_every = max(1, refresh_every)
+        self.size = size
+        self.frames = 0
+        self.computed = 0
+        self.last_change = 0.0
+        self._reference: Optional[np.ndarray] = None
+        self._range = 1.0
+        self._since_refresh = 0
+
+    def check(self, img: np.ndarray) -> bool:
+        """True if ``img`` should be scored; it then becomes the new reference."""
+        thumb = cv2.resize(img, self.size, interpolation=cv2.INTER_AREA).astype(np.float32)
+        self.frames += 1
+        self._since_refresh += 1
+        if self._reference is not None and self._since_refresh < self.refresh_every:
+            self.last_change = float(np.abs(thumb - self._reference).mean()) / self._range
+            if self.last_change < self.threshold:
+                return False
+        self._reference = thumb
+        self._range = max(float(thumb.max() - thumb.min()), 1e-6)
+        self._since_refresh = 0
+        self.computed += 1
+        return True
+
+    def check_batch(self, frames: np.ndarray) -> np.ndarray:
+        return np.fromiter((self.check(img) for img in frames), dtype=bool, count=len(frames))
+
+    def stats(self) -> dict:
+        skipped = self.frames - self.computed
+        return {
+            "frames": self.frames,
+            "computed": self.computed,
+            "skipped": skipped,
+            "skip_ratio": skipped / self.frames if self.frames else 0.0,
+        }
@@ -0,0 +1,88 @@
+from __future__ import annotations
+import math
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class PacingStats:
+    target_fps: float
+    achieved_fps: float
+    frames: int
+    skipped: int
+    jitter_ms: float
+    max_lateness_ms: float
+
+
+class FramePacer:
+    """Schedules frames on absolute deadlines from ``time.monotonic()``.
+
+    Deadlines advance by exactly one interval per frame, so processing time
+    does not accumulate as drift. When the loop falls behind by up to
+    ``catch_up_frames`` intervals it runs without sleeping to catch up;
+    beyond that the missed deadlines are skipped and counted.
+
+    With ``paced`` off ``wait`` returns at once with the nominal tick of the
+    next frame (start + n intervals), so timestamps keep their spacing while
+    a file is replayed as fast as it decodes.
+    """
+
+    def __init__(self, frame_rate: float, catch_up_frames: int = 2, paced: bool = True):
+        self.frame_rate = frame_rate
+        self.paced = paced
+        self.interval = 1.0 / frame_rate
+        self.catch_up_frames = catch_up_frames
+        self.frames = 0
+        self.skipped = 0
+        self._next: float | None = None
+        self._first_tick = 0.0
+        self._last_tick = 0.0
+        # Welford accumulators over lateness (tick - deadline), seconds
+        self._late_mean = 0.0
+        self._late_m2 = 0.0
+        self._late_max = 0.0
+
+    def wait(self) -> float:
+        """Blocks until the next deadline and returns the actual tick time."""
+        now = time.monotonic()
+        if self._next is None:
+            self._next = now
+            self._first_tick = now
+        if not self.paced:
+            tick = self._next
+            self.frames += 1
+            self._last_tick = now
+            self._next += self.interval
+            return tick
+        if now < self._next:
+            time.sleep(self._next - now)
+        else:
+            behind = int((now - self._next) / self.interval)
+            if behind > self.catch_up_frames:
+                self._next += behind * self.interval
+                self.skipped += behind
+        tick = time.monotonic()
+        self._record(tick - self._next)
+        self._last_tick = tick
+        self._next += self.interval
+        return tick
+
+    def _record(self, lateness: float):
+        self.frames += 1
+        delta = lateness - self._late_mean
+        self._late_mean += delta / self.frames
+        self._late_m2 += delta * (lateness - self._late_mean)
+        self._late_max = max(self._late_max, lateness)
+
+    def stats(self) -> PacingStats:
+        elapsed = self._last_tick - self._first_tick
+        achieved = (self.frames - 1) / elapsed if self.frames > 1 and elapsed > 0 else 0.0
+        jitter = math.sqrt(self._late_m2 / self.frames) if self.frames else 0.0
+        return PacingStats(
+            target_fps=float(self.frame_rate),
+            achieved_fps=achieved,
+            frames=self.frames,
+            skipped=self.skipped,
+            jitter_ms=jitter * 1000,
+            max_lateness_ms=self._late_max * 1000,
+        )
@@ -0,0 +1,37 @@
+from __future__ import annotations
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class Palette:
+    """Display colouring of single-channel thermal data through a 256-entry LUT.
+
+    The LUT is computed once from an OpenCV colormap. ``render`` resizes the
+    single-channel data first, so the colour image only ever exists at the
+    size a consumer asked for. Data that is not uint8, or any data when
+    ``normalize`` is set, is stretched to 0..255 over ``value_range`` or the
+    frame's own min/max.
+    """
+
+    def __init__(self, colormap: int = cv2.COLORMAP_JET, normalize: bool = False, value_range: Optional[Tuple[float, float]] = None):
+        self.lut = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), colormap)
+        self.normalize = normalize
+        self.value_range = value_range
+
+    def render(self, data: np.ndarray, size: Optional[Tuple[int, int]] = None, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """BGR image of ``data`` at ``size`` (width, height), written into ``dst`` when it fits."""
+        if size is not None and size != (data.shape[1], data.shape[0]):
+            shrink = size[0] < data.shape[1]
+            data = cv2.resize(data, size, interpolation=cv2.INTER_AREA if shrink else cv2.INTER_LINEAR)
+        return cv2.applyColorMap(self.to_uint8(data), self.lut, dst=dst)
+
+    def to_uint8(self, data: np.ndarray) -> np.ndarray:
+        if data.dtype == np.uint8 and not self.normalize:
+            return data
+        if self.value_range is None:
+            return cv2.normalize(data, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+        lo, hi = self.value_range
+        scale = 255.0 / max(hi - lo, 1e-6)
+        return cv2.convertScaleAbs(np.clip(data, lo, hi), alpha=scale, beta=-lo * scale)
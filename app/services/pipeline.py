@@ -0,0 +1,211 @@
+from __future__ import annotations
+import logging
+import queue
+import threading
+import time
+from dataclasses import asdict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.services.deception import DeceptionService
+from app.services.encoder import VideoEncoder
+from app.services.pacing import FramePacer
+from app.services.queues import BLOCK, DROP_OLDEST, QueueClosed, RingQueue
+from app.services.raw_recorder import RawRecorder
+from app.services.thermal_adapters import EndOfStream, ThermalAdapter, ThermalFrame
+from app.utils.timeline import Timeline
+
+
+class CapturePipeline:
+    """Capture -> inference -> encode/preview stages, each on its own thread.
+
+    Capture and inference are linked by the ``capture`` queue; inference fans
+    out to the video encoder's queue, the raw recorder's queue (when sensor
+    data is recorded alongside the video) and the ``preview`` queue, which is
+    drained by the caller via ``get_preview``. Stopping, or the adapter
+    reaching ``EndOfStream``, closes the queues front to back, so every
+    captured frame is still scored and encoded before ``join`` returns.
+
+    Frames from pooled adapters are reference counted: the encoder and the
+    preview consumer and the raw recorder each hold a reference and ``release`` it when done,
+    and frames evicted from a queue are released on the spot.
+    """
+
+    def __init__(
+        self,
+        adapter: ThermalAdapter,
+        deception: DeceptionService,
+        frame_rate: int = 15,
+        catch_up_frames: int = 2,
+        encoder: Optional[VideoEncoder] = None,
+        raw_recorder: Optional[RawRecorder] = None,
+        on_result: Optional[Callable[[int, str, float, bool], None]] = None,
+        capture_queue: int = 8,
+        preview_queue: int = 2,
+        capture_policy: str = BLOCK,
+        preview_policy: str = DROP_OLDEST,
+        max_batch: int = 1,
+        batch_latency_ms: float = 20,
+    ):
+        self.adapter = adapter
+        self.deception = deception
+        self.frame_rate = frame_rate
+        self.pacer = FramePacer(frame_rate, catch_up_frames, paced=adapter.realtime)
+        self.encoder = encoder
+        self.raw_recorder = raw_recorder
+        self.on_result = on_result
+        self.max_batch = max(1, max_batch)
+        self.batch_latency = batch_latency_ms / 1000
+        self.capture_queue = RingQueue("capture", capture_queue, capture_policy)
+        self.preview_queue = RingQueue("preview", preview_queue, preview_policy)
+        self.capture_queue.on_drop = _release_item
+        self.preview_queue.on_drop = _release_item
+        self.timeline = Timeline()
+        self.error: Optional[str] = None
+        self._running = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        self._running = True
+        for sink in self._sinks():
+            sink.start()
+        self._threads = [
+            threading.Thread(target=self._run_stage, args=("capture", self._capture_loop, [self.capture_queue]), daemon=True),
+            threading.Thread(target=self._run_stage, args=("inference", self._inference_loop, self._outputs()), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def join(self, timeout: float | None = None):
+        for thread in self._threads:
+            thread.join(timeout)
+        for sink in self._sinks():
+            sink.close(timeout)
+            if sink.error and self.error is None:
+                self.error = sink.error
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def get_preview(self, timeout: float | None = None):
+        return self.preview_queue.get(timeout)
+
+    def queue_depths(self) -> dict[str, int]:
+        return {q.name: q.depth for q in self._queues()}
+
+    def stats(self) -> dict:
+        return {
+            "frames": len(self.timeline),
+            "pacing": asdict(self.pacer.stats()),
+            "queues": {q.name: q.stats() for q in self._queues()},
+            "encoder": self.encoder.stats() if self.encoder is not None else None,
+            "raw": self.raw_recorder.stats() if self.raw_recorder is not None else None,
+            "inference": self.deception.stats(),
+            "source": self.adapter.source_stats(),
+            "buffers": self.adapter.buffer_stats(),
+        }
+
+    def _outputs(self) -> List[RingQueue]:
+        outputs = [self.preview_queue]
+        if self.encoder is not None:
+            outputs.append(self.encoder.queue)
+        if self.raw_recorder is not None:
+            outputs.append(self.raw_recorder.queue)
+        return outputs
+
+    def _sinks(self) -> list:
+        return [sink for sink in (self.encoder, self.raw_recorder) if sink is not None]
+
+    def _queues(self) -> List[RingQueue]:
+        return [self.capture_queue] + self._outputs()
+
+    def _run_stage(self, name: str, loop: Callable[[], None], downstream: List[RingQueue]):
+        try:
+            loop()
+        except Exception as exc:
+            logging.exception("Pipeline stage %s failed", name)
+            if self.error is None:
+                self.error = str(exc)
+            self._running = False
+            # unblock upstream producers waiting on a queue nobody drains anymore
+            for q in self._queues():
+                q.close()
+        finally:
+            for q in downstream:
+                q.close()
+
+    def _put(self, q: RingQueue, item) -> bool:
+        while not q.put(item, timeout=0.1):
+            if q.closed:
+                return False
+        return True
+
+    def _capture_loop(self):
+        while self._running:
+            tick = self.pacer.wait()
+            try:
+                frame = self.adapter.read_frame()
+            except EndOfStream:
+                logging.info("Capture source ended")
+                self._running = False
+                break
+            ts_ms = int(tick * 1000)
+            if not self._put(self.capture_queue, (frame, ts_ms)):
+                frame.release()
+                break
+
+    def _next_batch(self) -> list:
+        """Takes one frame, plus any more that arrive within the latency budget."""
+        batch = [self.capture_queue.get()]
+        deadline = time.monotonic() + self.batch_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.capture_queue.get(remaining))
+            except (queue.Empty, QueueClosed):
+                break
+        return batch
+
+    def _inference_loop(self):
+        while True:
+            try:
+                batch = self._next_batch()
+            except QueueClosed:
+                break
+            if len(batch) == 1:
+                frame, ts_ms = batch[0]
+                results = [self.deception.infer(frame, ts_ms)]
+            else:
+                stack = np.stack([self.deception.frame_data(frame) for frame, _ in batch])
+                labels, scores = self.deception.infer_batch(stack, [ts_ms for _, ts_ms in batch])
+                results = list(zip(labels, scores.tolist()))
+            computed = self.deception.last_computed.tolist()
+            for (frame, ts_ms), (label, score), scored in zip(batch, results, computed):
+                self._publish(frame, ts_ms, label, score, scored)
+
+    def _publish(self, frame: ThermalFrame, ts_ms: int, label: str, score: float, computed: bool):
+        try:
+            self.timeline.append(ts_ms, label, score, computed)
+            if self.on_result is not None:
+                self.on_result(ts_ms, label, score, computed)
+            if self.encoder is not None and not self._put(self.encoder.queue, (frame.retain(), ts_ms)):
+                frame.release()
+                raise RuntimeError(self.encoder.error or "Video encoder stopped")
+            if self.raw_recorder is not None and not self._put(self.raw_recorder.queue, (frame.retain(), ts_ms)):
+                frame.release()
+                raise RuntimeError(self.raw_recorder.error or "Raw recorder stopped")
+            if not self.preview_queue.put((frame.retain(), ts_ms, label, score)):
+                frame.release()
+        finally:
+            frame.release()
+
+
+def _release_item(item: tuple):
+    item[0].release()
@@ -0,0 +1,261 @@
+from __future__ import annotations
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+
+from app.services.palette import Palette
+from app.utils.rawstream import RawStreamReader
+
+
+class VideoFrameSource:
+    """Decoded BGR frames of a video file by index, cached around the playhead.
+
+    Reading the frame after the last decoded one just continues the decoder;
+    any other index seeks (OpenCV goes to the preceding keyframe and decodes
+    forward). ``prefetch`` has a background thread decode the next
+    ``read_ahead`` frames so playback is served from the cache; the cache
+    keeps the ``cache_frames`` most recently used frames, which also covers
+    short scrubs backwards.
+    """
+
+    def __init__(self, path: Path, cache_frames: int = 150, read_ahead: int = 30):
+        self._cap = cv2.VideoCapture(str(path))
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Cannot open file {path}")
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.cache_frames = max(cache_frames, read_ahead + 1)
+        self.read_ahead = read_ahead
+        self.hits = 0
+        self.misses = 0
+        self.seeks = 0
+        self._pos = 0  # index of the frame the next cap.read() returns
+        self._cache: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()  # guards the capture, _pos and the cache
+        self._wake = threading.Condition()
+        self._wanted: Optional[int] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._read_ahead_loop, daemon=True)
+        self._thread.start()
+
+    def frame(self, i: int) -> Optional[np.ndarray]:
+        with self._lock:
+            cached = self._cache.get(i)
+            if cached is not None:
+                self._cache.move_to_end(i)
+                self.hits += 1
+                return cached
+            self.misses += 1
+            return self._decode_to(i)
+
+    def prefetch(self, i: int):
+        with self._wake:
+            self._wanted = i
+            self._wake.notify()
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+        self._cap.release()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "seeks": self.seeks, "cached": len(self._cache)}
+
+    def _decode_to(self, i: int) -> Optional[np.ndarray]:
+        # a short gap ahead is cheaper to decode through than to seek over
+        if i < self._pos or i > self._pos + self.read_ahead:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+            self._pos = i
+            self.seeks += 1
+        frame = None
+        while self._pos <= i:
+            ok, frame = self._cap.read()
+            if not ok:
+                # past the end, or a broken frame: the position is unknown now, seek next time
+                self._pos = sys.maxsize
+                return None
+            self._cache[self._pos] = frame
+            if len(self._cache) > self.cache_frames:
+                self._cache.popitem(last=False)
+            self._pos += 1
+        return frame
+
+    def _read_ahead_loop(self):
+        while True:
+            with self._wake:
+                while self._wanted is None and not self._closed:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                start, self._wanted = self._wanted, None
+            for i in range(start, min(start + self.read_ahead, self.frame_count)):
+                with self._wake:
+                    if self._wanted is not None or self._closed:
+                        break  # the playhead moved, start over from there
+                with self._lock:
+                    if i not in self._cache and self._decode_to(i) is None:
+                        break
+
+
+class RawFrameSource:
+    """Frames of a raw sensor stream, coloured for display.
+
+    Every frame is an O(1) read from ``RawStreamReader``, so there is
+    nothing to cache or read ahead. The palette range is fixed from a few
+    frames across the session, so the colours do not pump with the content.
+    """
+
+    def __init__(self, reader: RawStreamReader, colormap: int = cv2.COLORMAP_JET):
+        self.reader = reader
+        self.frame_count = len(reader)
+        samples = np.stack([reader.frame(i) for i in np.linspace(0, len(reader) - 1, 5).astype(int)])
+        lo, hi = np.percentile(samples, (1, 99))
+        self.palette = Palette(colormap, normalize=True, value_range=(float(lo), float(hi)))
+
+    def frame(self, i: int) -> Optional[np.ndarray]:
+        if not 0 <= i < self.frame_count:
+            return None
+        return self.palette.render(self.reader.frame(i))
+
+    def prefetch(self, i: int):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"frames": self.frame_count}
+
+
+class AudioBlockReader:
+    """Block reads from a PCM WAV file at any sample offset.
+
+    Seeking in PCM is a file offset computation, so a read anywhere in a
+    long recording costs the same as at the start. Consecutive reads skip
+    the seek. Samples outside the file come back as silence.
+    """
+
+    def __init__(self, path: Path):
+        self._file = sf.SoundFile(str(path))
+        self.samplerate = self._file.samplerate
+        self.channels = self._file.channels
+        self.frames = self._file.frames
+        self._next = 0
+
+    def read(self, start: int, count: int) -> np.ndarray:
+        out = np.zeros((count, self.channels), dtype=np.float32)
+        lo, hi = max(start, 0), min(start + count, self.frames)
+        if lo < hi:
+            if lo != self._next:
+                self._file.seek(lo)
+            self._file.read(hi - lo, dtype="float32", always_2d=True, out=out[lo - start : hi - start])
+            self._next = hi
+        return out
+
+    def close(self):
+        self._file.close()
+
+
+class SessionPlayer:
+    """Playhead over a recorded session, in the recording clock (monotonic ms).
+
+    With an audio file the output stream is the master clock: the position
+    is the number of samples handed to the device, so picture and sound
+    cannot drift apart. Without audio, or without an output device, a
+    monotonic clock moves the playhead. ``audio_start_ms`` is the session
+    time of the first sample in the file.
+    """
+
+    def __init__(
+        self,
+        start_ms: int,
+        end_ms: int,
+        audio: Optional[AudioBlockReader] = None,
+        audio_start_ms: int = 0,
+        blocksize: int = 1024,
+    ):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.audio = audio
+        self.audio_start_ms = audio_start_ms
+        self.blocksize = blocksize
+        self._position = float(start_ms)
+        self._sample = 0
+        self._clock_origin: Optional[float] = None
+        self._stream: Optional[sd.OutputStream] = None
+        self._lock = threading.Lock()
+
+    @property
+    def playing(self) -> bool:
+        return self._stream is not None or self._clock_origin is not None
+
+    def position_ms(self) -> int:
+        with self._lock:
+            if self._stream is not None:
+                return int(self.audio_start_ms + self._sample * 1000 / self.audio.samplerate)
+            if self._clock_origin is not None:
+                return int(self._position + (time.monotonic() - self._clock_origin) * 1000)
+            return int(self._position)
+
+    def play(self):
+        if self.playing:
+            return
+        if self.audio is not None:
+            try:
+                self._sample = self._to_sample(self._position)
+                self._stream = sd.OutputStream(
+                    samplerate=self.audio.samplerate,
+                    channels=self.audio.channels,
+                    blocksize=self.blocksize,
+                    dtype="float32",
+                    callback=self._fill,
+                )
+                self._stream.start()
+                return
+            except Exception:
+                logging.exception("Audio output unavailable, playing without sound")
+                self._stream = None
+        self._clock_origin = time.monotonic()
+
+    def pause(self):
+        position = self.position_ms()
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+        with self._lock:
+            self._clock_origin = None
+            self._position = float(position)
+
+    def seek(self, ts_ms: int):
+        ts_ms = min(max(ts_ms, self.start_ms), self.end_ms)
+        with self._lock:
+            self._position = float(ts_ms)
+            self._sample = self._to_sample(ts_ms)
+            if self._clock_origin is not None:
+                self._clock_origin = time.monotonic()
+
+    def close(self):
+        self.pause()
+        if self.audio is not None:
+            self.audio.close()
+
+    def _to_sample(self, ts_ms: float) -> int:
+        return int(round((ts_ms - self.audio_start_ms) * self.audio.samplerate / 1000)) if self.audio else 0
+
+    def _fill(self, outdata, frames, time_info, status):
+        # runs on the audio thread; a PCM block read is a page-cache copy
+        with self._lock:
+            start = self._sample
+            self._sample += frames
+        outdata[:] = self.audio.read(start, frames)
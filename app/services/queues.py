@@ -0,0 +1,89 @@
+from __future__ import annotations
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Optional
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+DROP_POLICIES = (DROP_OLDEST, BLOCK)
+
+
+class QueueClosed(Exception):
+    """Raised by RingQueue.get once the queue is closed and drained."""
+
+
+class RingQueue:
+    """Bounded FIFO linking two pipeline stages.
+
+    With the ``block`` policy a full queue makes the producer wait (nothing is
+    lost, used for recording); with ``drop_oldest`` the oldest item is evicted
+    so the consumer always sees the freshest data (used for preview).
+    """
+
+    def __init__(self, name: str, maxsize: int, policy: str = BLOCK):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        if maxsize < 1:
+            raise ValueError("Queue size must be positive")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_drop: Optional[Callable[[Any], None]] = None
+        self.dropped = 0
+        self.high_water = 0
+        self._items: Deque[Any] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def put(self, item: Any, timeout: float | None = None) -> bool:
+        evicted = None
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    evicted = self._items.popleft()
+                    self.dropped += 1
+                elif not self._cond.wait_for(lambda: self._closed or len(self._items) < self.maxsize, timeout):
+                    return False
+                if self._closed:
+                    return False
+            self._items.append(item)
+            self.high_water = max(self.high_water, len(self._items))
+            self._cond.notify_all()
+        if evicted is not None and self.on_drop:
+            self.on_drop(evicted)
+        return True
+
+    def get(self, timeout: float | None = None) -> Any:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise queue.Empty
+            if not self._items:
+                raise QueueClosed(self.name)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "dropped": self.dropped,
+            "high_water": self.high_water,
+        }
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.config import AppConfig
+from app.services.queues import BLOCK, QueueClosed, RingQueue
+from app.services.thermal_adapters import ThermalFrame
+from app.utils.rawstream import RawStreamWriter
+
+
+class RawRecorder:
+    """Writes the sensor data of every frame to a raw chunk stream from its own thread.
+
+    Mirrors ``VideoEncoder``: items are ``(ThermalFrame, ts_ms)`` pairs
+    holding a reference, released once the frame is written. The frame's
+    ``temperature_matrix`` is stored when present, the single-channel
+    display data otherwise, so the stream keeps what inference saw.
+    """
+
+    def __init__(self, folder: Path, chunk_frames: int = 64, compression: str = "none", queue_size: int = 64, policy: str = BLOCK):
+        self.writer = RawStreamWriter(folder, chunk_frames, compression)
+        self.queue = RingQueue("raw", queue_size, policy)
+        self.queue.on_drop = _release
+        self.write_seconds = 0.0
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float | None = None):
+        self.queue.close()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    item = self.queue.get()
+                except QueueClosed:
+                    break
+                started = time.perf_counter()
+                frame, ts_ms = item
+                try:
+                    data = frame.temperature_matrix if frame.temperature_matrix is not None else frame.frame
+                    self.writer.append(data, ts_ms)
+                finally:
+                    frame.release()
+                self.write_seconds += time.perf_counter() - started
+        except Exception as exc:
+            logging.exception("Raw recorder failed")
+            self.error = str(exc)
+            self.queue.close()
+        finally:
+            # the last chunk is truncated or compressed here
+            started = time.perf_counter()
+            try:
+                self.writer.close()
+                self.write_seconds += time.perf_counter() - started
+            except Exception as exc:
+                logging.exception("Raw recorder close failed")
+                self.error = self.error or str(exc)
+
+    def stats(self) -> dict:
+        frames = self.writer.frames
+        return {
+            **self.writer.stats(),
+            "write_seconds": self.write_seconds,
+            "write_fps": frames / self.write_seconds if self.write_seconds else 0.0,
+            "queue": self.queue.stats(),
+        }
+
+
+def _release(item: tuple):
+    item[0].release()
+
+
+def create_raw_recorder(folder: Path, config: AppConfig) -> RawRecorder:
+    return RawRecorder(folder, config.raw_chunk_frames, config.raw_compression, config.encode_queue, config.encode_policy)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+Roi = Tuple[int, int, int, int]  # x, y, w, h
+
+
+def center_roi(shape: Tuple[int, ...]) -> Roi:
+    """The central 50% of the frame, the fallback when nothing is detected."""
+    h, w = shape[:2]
+    return w // 4, h // 4, w * 3 // 4 - w // 4, h * 3 // 4 - h // 4
+
+
+def to_gray8(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.dtype == np.uint8 else img.mean(axis=2)
+    if img.dtype != np.uint8:
+        img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+    return img
+
+
+def _load_face_cascade():
+    # OpenCV 5 moved the cascade classifier out of the main module
+    if not hasattr(cv2, "CascadeClassifier"):
+        logging.warning("Haar face cascade not available, using warm-region detection only")
+        return None
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    if cascade.empty():
+        logging.warning("Haar face cascade not available, using warm-region detection only")
+        return None
+    return cascade
+
+
+class RoiTracker:
+    """Finds the face region and follows it across frames.
+
+    The detector (a Haar face cascade, falling back to the largest warm blob
+    for thermal images where the cascade finds nothing) runs every
+    ``detect_every`` frames or after tracking is lost. Between detections
+    the region is tracked by normalised template matching in a window
+    around its last position, which costs far less than detection.
+    """
+
+    def __init__(self, detect_every: int = 15, search_margin: float = 0.5, min_match: float = 0.5, detect_width: int = 320):
+        self.detect_every = max(1, detect_every)
+        self.search_margin = search_margin
+        self.min_match = min_match
+        self.detect_width = detect_width
+        self.roi: Optional[Roi] = None
+        self.detections = 0
+        self.tracked = 0
+        self.lost = 0
+        self._template: Optional[np.ndarray] = None
+        self._since_detect = self.detect_every
+        self._cascade = _load_face_cascade()
+
+    def update(self, img: np.ndarray) -> Roi:
+        """Returns the region for this frame; the frame centre if there is none.
+
+        A failed detection is retried after ``detect_every`` frames, not on
+        every frame.
+        """
+        gray = to_gray8(img)
+        if self._since_detect >= self.detect_every:
+            self._detect(gray)
+        elif self.roi is not None:
+            self._track(gray)
+        self._since_detect += 1
+        return self.roi if self.roi is not None else center_roi(gray.shape)
+
+    def stats(self) -> dict:
+        return {"roi": self.roi, "detections": self.detections, "tracked": self.tracked, "lost": self.lost}
+
+    def _detect(self, gray: np.ndarray):
+        self._since_detect = 0
+        self.detections += 1
+        scale = min(1.0, self.detect_width / gray.shape[1])
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        roi = self._detect_face(small) or self._detect_warm_region(small)
+        if roi is None:
+            self.roi = None
+            self._template = None
+            return
+        x, y, w, h = (int(round(v / scale)) for v in roi)
+        self.roi = (x, y, w, h)
+        self._template = gray[y : y + h, x : x + w].copy()
+
+    def _detect_face(self, gray: np.ndarray) -> Optional[Roi]:
+        if self._cascade is None:
+            return None
+        faces = self._cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=4, minSize=(24, 24))
+        if len(faces) == 0:
+            return None
+        return tuple(max(faces, key=lambda f: f[2] * f[3]))
+
+    @staticmethod
+    def _detect_warm_region(gray: np.ndarray) -> Optional[Roi]:
+        _, mask = cv2.threshold(cv2.GaussianBlur(gray, (5, 5), 0), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        area = gray.shape[0] * gray.shape[1]
+        if not 0.01 * area <= w * h <= 0.9 * area:
+            return None
+        return x, y, w, h
+
+    def _track(self, gray: np.ndarray):
+        x, y, w, h = self.roi
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        search = gray[y0:y1, x0:x1]
+        if search.shape[0] < h or search.shape[1] < w:
+            self._lose()
+            return
+        result = cv2.matchTemplate(search, self._template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(result)
+        if score < self.min_match:
+            self._lose()
+            return
+        self.tracked += 1
+        self.roi = (x0 + loc[0], y0 + loc[1], w, h)
+
+    def _lose(self):
+        # keep the last region for this frame, re-detect on the next one
+        self.lost += 1
+        self._since_detect = self.detect_every
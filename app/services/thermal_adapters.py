@@ -1,18 +1,101 @@
 from __future__ import annotations
+import logging
+import threading
+import time
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
+
+from app.services.buffers import FramePool, ScratchBuffers
+from app.services.palette import Palette
+from app.services.queues import BLOCK, QueueClosed, RingQueue
+
+DEFAULT_PALETTE = Palette(cv2.COLORMAP_JET, normalize=True)
+
+
+class EndOfStream(Exception):
+    """Raised by ``read_frame`` when a finite source has no more frames."""
 
 
 class ThermalFrame:
-    def __init__(self, frame: np.ndarray, temperature_matrix: Optional[np.ndarray] = None):
+    """A captured frame, optionally backed by arrays borrowed from a ``FramePool``.
+
+    Adapters provide the single-channel ``temperature_matrix``, which is what
+    inference reads; ``frame`` is an optional ready-made BGR image. Display
+    and recording call ``render`` for a colour image at their own size,
+    coloured by ``palette`` when there is no ``frame``.
+
+    Pooled frames are reference counted: every consumer that keeps the frame
+    past the producer's hand-off calls ``retain`` and later ``release``; the
+    arrays go back to the pool when the count drops to zero. Frames without
+    a pool ignore both.
+    """
+
+    def __init__(
+        self,
+        frame: Optional[np.ndarray] = None,
+        temperature_matrix: Optional[np.ndarray] = None,
+        pool: Optional[FramePool] = None,
+        palette: Optional[Palette] = None,
+    ):
+        if frame is None and temperature_matrix is None:
+            raise ValueError("ThermalFrame needs a frame or a temperature matrix")
         self.frame = frame
         self.temperature_matrix = temperature_matrix
+        self.palette = palette or DEFAULT_PALETTE
+        self._pool = pool
+        self._refs = 1
+        self._lock = threading.Lock() if pool is not None else None
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        data = self.temperature_matrix if self.temperature_matrix is not None else self.frame
+        return data.shape[1], data.shape[0]
+
+    def render(self, size: Optional[Tuple[int, int]] = None, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """BGR image at ``size`` (width, height); returns ``frame`` itself when no resize is needed."""
+        if self.frame is not None:
+            if size is None or size == self.size:
+                return self.frame
+            return cv2.resize(self.frame, size, dst=dst, interpolation=cv2.INTER_AREA)
+        return self.palette.render(self.temperature_matrix, size, dst)
+
+    def retain(self) -> "ThermalFrame":
+        if self._lock is not None:
+            with self._lock:
+                self._refs += 1
+        return self
+
+    def release(self):
+        if self._lock is None:
+            return
+        with self._lock:
+            self._refs -= 1
+            if self._refs:
+                return
+        for array in (self.frame, self.temperature_matrix):
+            if array is not None:
+                self._pool.release(array)
 
 
 class ThermalAdapter:
-    """Base class for thermal camera adapters."""
+    """Base class for thermal camera adapters.
+
+    ``read_frame`` returns raw single-channel data; ``palette`` is the false
+    colouring applied when the frame is shown or recorded. Sources with
+    ``realtime`` off are read as fast as the pipeline can take frames
+    instead of being paced to ``frame_rate``. Adapters that fill frames
+    from ``pool`` report its counters and their scratch allocations through
+    ``buffer_stats``.
+    """
+
+    palette: Palette = DEFAULT_PALETTE
+    realtime = True
+    # native rate of the source; None follows recording.frame_rate
+    frame_rate: Optional[float] = None
+    pool: Optional[FramePool] = None
+    scratch: Optional[ScratchBuffers] = None
 
     def list_devices(self) -> List[str]:
         raise NotImplementedError
@@ -26,12 +109,24 @@ class ThermalAdapter:
     def close(self):
         raise NotImplementedError
 
+    def source_stats(self) -> Optional[dict]:
+        return None
+
+    def buffer_stats(self) -> Optional[dict]:
+        if self.pool is None:
+            return None
+        return self.pool.stats() | {"scratch_allocations": self.scratch.allocations if self.scratch else 0}
+
 
 class DummyThermalAdapter(ThermalAdapter):
     """Uses a standard webcam to simulate thermal output."""
 
     def __init__(self):
         self.cap: Optional[cv2.VideoCapture] = None
+        self.pool = FramePool()
+        self.scratch = ScratchBuffers()
+        # Fake thermal coloring, applied only for display and recording
+        self.palette = Palette(cv2.COLORMAP_JET, normalize=True)
 
     def list_devices(self) -> List[str]:
         # In practice we guess first few indices
@@ -46,14 +141,12 @@ class DummyThermalAdapter(ThermalAdapter):
     def read_frame(self) -> ThermalFrame:
         if not self.cap:
             raise RuntimeError("Camera not opened")
-        ret, frame = self.cap.read()
+        ret, frame = self.cap.read(self.scratch.last("capture"))
         if not ret:
             raise RuntimeError("Failed to read frame")
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        # Fake thermal coloring
-        normalized = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
-        thermal = cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
-        return ThermalFrame(thermal)
+        self.scratch.keep("capture", frame)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.pool.acquire(frame.shape[:2]))
+        return ThermalFrame(temperature_matrix=gray, pool=self.pool, palette=self.palette)
 
     def close(self):
         if self.cap:
@@ -62,9 +155,28 @@ class DummyThermalAdapter(ThermalAdapter):
 
 
 class FileThermalAdapter(ThermalAdapter):
-    def __init__(self, video_path: Path):
+    """Replays a video file as a thermal source.
+
+    A decoder thread reads up to ``prefetch`` frames ahead into a bounded
+    queue, so decoding overlaps with the rest of the pipeline. With
+    ``realtime`` off the pipeline does not pace the file to ``frame_rate``
+    and it is replayed as fast as it can be processed. With ``loop`` off
+    ``read_frame`` raises ``EndOfStream`` after the last frame instead of
+    starting over.
+    """
+
+    def __init__(self, video_path: Path, loop: bool = True, realtime: bool = True, prefetch: int = 8):
         self.video_path = video_path
+        self.loop = loop
+        self.realtime = realtime
+        self.prefetch = prefetch
         self.cap: Optional[cv2.VideoCapture] = None
+        self.pool = FramePool()
+        self.scratch = ScratchBuffers()
+        self.palette = Palette(cv2.COLORMAP_PLASMA)
+        self.error: Optional[str] = None
+        self._frames: Optional[RingQueue] = None
+        self._thread: Optional[threading.Thread] = None
 
     def list_devices(self) -> List[str]:
         if self.video_path.exists():
@@ -76,32 +188,202 @@ class FileThermalAdapter(ThermalAdapter):
         self.cap = cv2.VideoCapture(str(path))
         if not self.cap.isOpened():
             raise RuntimeError(f"Cannot open file {device}")
+        self.error = None
+        self._frames = RingQueue("decode", self.prefetch, BLOCK)
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._thread.start()
 
     def read_frame(self) -> ThermalFrame:
-        if not self.cap:
+        if not self._frames:
             raise RuntimeError("File not opened")
-        ret, frame = self.cap.read()
-        if not ret:
-            # loop
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.cap.read()
-            if not ret:
-                raise RuntimeError("Failed to read frame")
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        thermal = cv2.applyColorMap(gray, cv2.COLORMAP_PLASMA)
-        return ThermalFrame(thermal)
+        try:
+            return self._frames.get()
+        except QueueClosed:
+            if self.error:
+                raise RuntimeError(self.error) from None
+            raise EndOfStream(str(self.video_path)) from None
 
     def close(self):
+        if self._frames:
+            self._frames.close()
+            if self._thread:
+                self._thread.join()
+            # hand back frames decoded ahead that nobody will read
+            while self._frames.depth:
+                self._frames.get().release()
+            self._frames = None
+            self._thread = None
         if self.cap:
             self.cap.release()
             self.cap = None
 
+    def buffer_stats(self) -> Optional[dict]:
+        stats = super().buffer_stats()
+        if self._frames is not None:
+            stats["prefetch"] = self._frames.stats()
+        return stats
+
+    def _decode_loop(self):
+        try:
+            while not self._frames.closed:
+                ret, frame = self.cap.read(self.scratch.last("capture"))
+                if not ret:
+                    if not self.loop:
+                        break
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, frame = self.cap.read(self.scratch.last("capture"))
+                    if not ret:
+                        raise RuntimeError("Failed to read frame")
+                self.scratch.keep("capture", frame)
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.pool.acquire(frame.shape[:2]))
+                item = ThermalFrame(temperature_matrix=gray, pool=self.pool, palette=self.palette)
+                if not self._frames.put(item):
+                    item.release()
+                    break
+        except Exception as exc:
+            logging.exception("File decoder failed")
+            self.error = str(exc)
+        finally:
+            self._frames.close()
+
+
+class SyntheticThermalAdapter(ThermalAdapter):
+    """Procedural thermal camera for load tests on machines without one.
+
+    Frames are a background with a slight vertical gradient, ``blobs`` warm
+    spots moving on smooth periodic paths and sensor noise, all derived
+    from ``seed`` so runs are reproducible. Values are degrees Celsius for
+    float32, centikelvin for uint16 (the usual radiometric encoding) and
+    20..40 °C mapped to 0..255 for uint8. Blob stamps and a bank of noise
+    frames are computed once in ``open``, so producing a frame is a few
+    array additions. ``spike_every``/``spike_ms`` delay every n-th frame to
+    reproduce capture stalls; ``spike_jitter`` picks the frames at random
+    from the seeded generator instead.
+    """
+
+    T_MIN = 20.0
+    T_MAX = 40.0
+    NOISE_FRAMES = 16
+
+    def __init__(
+        self,
+        width: int = 640,
+        height: int = 512,
+        dtype: str = "uint16",
+        fps: float = 60,
+        blobs: int = 3,
+        noise: float = 0.05,
+        seed: int = 0,
+        spike_every: int = 0,
+        spike_ms: float = 0.0,
+        spike_jitter: bool = False,
+        realtime: bool = True,
+    ):
+        if dtype not in ("uint8", "uint16", "float32"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.width = width
+        self.height = height
+        self.dtype = np.dtype(dtype)
+        self.frame_rate = fps
+        self.blobs = blobs
+        self.noise = noise
+        self.seed = seed
+        self.spike_every = spike_every
+        self.spike_ms = spike_ms
+        self.spike_jitter = spike_jitter
+        self.realtime = realtime
+        self.pool = FramePool()
+        self.scratch = ScratchBuffers()
+        self.palette = Palette(cv2.COLORMAP_INFERNO, value_range=self._encode_range())
+        self.frames = 0
+        self.spikes = 0
+        self._opened = False
+
+    def list_devices(self) -> List[str]:
+        return [f"synthetic {self.width}x{self.height} {self.dtype.name} @ {self.frame_rate:g} fps"]
+
+    def open(self, device: str):
+        rng = np.random.default_rng(self.seed)
+        h, w = self.height, self.width
+        self._background = np.linspace(self.T_MIN + 2.0, self.T_MIN + 4.0, h, dtype=np.float32)[:, None].repeat(w, axis=1)
+        self._noise = (rng.standard_normal((self.NOISE_FRAMES, h, w)) * self.noise).astype(np.float32)
+        self._paths = []
+        for _ in range(self.blobs):
+            radius = int(rng.uniform(0.06, 0.15) * min(h, w))
+            axis = np.arange(-2 * radius, 2 * radius + 1, dtype=np.float32)
+            stamp = np.exp(-(axis[:, None] ** 2 + axis[None, :] ** 2) / (2 * radius**2)) * rng.uniform(6.0, 12.0)
+            # amplitude, frequency (Hz) and phase of the x and y oscillations
+            path = rng.uniform([0.2, 0.05, 0.0, 0.2, 0.05, 0.0], [0.4, 0.3, 2 * np.pi, 0.4, 0.3, 2 * np.pi])
+            self._paths.append((stamp.astype(np.float32), path))
+        self._spike_rng = np.random.default_rng(self.seed + 1)
+        self.frames = 0
+        self.spikes = 0
+        self._opened = True
+
+    def read_frame(self) -> ThermalFrame:
+        if not self._opened:
+            raise RuntimeError("Synthetic camera not opened")
+        self._maybe_spike()
+        t = self.frames / self.frame_rate
+        work = self.scratch.get("work", (self.height, self.width), np.float32)
+        np.add(self._background, self._noise[self.frames % self.NOISE_FRAMES], out=work)
+        for stamp, (ax, fx, px, ay, fy, py) in self._paths:
+            cx = int(self.width * (0.5 + ax * np.sin(2 * np.pi * fx * t + px)))
+            cy = int(self.height * (0.5 + ay * np.sin(2 * np.pi * fy * t + py)))
+            self._add_stamp(work, stamp, cx, cy)
+        self.frames += 1
+        out = self.pool.acquire(work.shape, self.dtype)
+        if self.dtype == np.uint16:
+            # work is scratch, convert in place to centikelvin
+            np.add(work, 273.15, out=work)
+            np.multiply(work, 100, out=work)
+            np.copyto(out, work, casting="unsafe")
+        elif self.dtype == np.uint8:
+            cv2.convertScaleAbs(work, out, alpha=255 / (self.T_MAX - self.T_MIN), beta=-self.T_MIN * 255 / (self.T_MAX - self.T_MIN))
+        else:
+            np.copyto(out, work)
+        return ThermalFrame(temperature_matrix=out, pool=self.pool, palette=self.palette)
+
+    def close(self):
+        self._opened = False
+
+    def source_stats(self) -> Optional[dict]:
+        return {"frames": self.frames, "spikes": self.spikes, "spike_ms": self.spike_ms}
+
+    def _encode_range(self) -> Optional[Tuple[float, float]]:
+        if self.dtype == np.uint16:
+            return (self.T_MIN + 273.15) * 100, (self.T_MAX + 273.15) * 100
+        if self.dtype == np.float32:
+            return self.T_MIN, self.T_MAX
+        return None
+
+    def _maybe_spike(self):
+        if not self.spike_every or self.spike_ms <= 0:
+            return
+        if self.spike_jitter:
+            hit = self._spike_rng.random() < 1.0 / self.spike_every
+        else:
+            hit = self.frames and self.frames % self.spike_every == 0
+        if hit:
+            self.spikes += 1
+            time.sleep(self.spike_ms / 1000)
+
+    @staticmethod
+    def _add_stamp(work: np.ndarray, stamp: np.ndarray, cx: int, cy: int):
+        r = stamp.shape[0] // 2
+        h, w = work.shape
+        x0, y0, x1, y1 = max(cx - r, 0), max(cy - r, 0), min(cx + r + 1, w), min(cy + r + 1, h)
+        if x0 < x1 and y0 < y1:
+            work[y0:y1, x0:x1] += stamp[y0 - cy + r : y1 - cy + r, x0 - cx + r : x1 - cx + r]
+
 
 class VendorThermalAdapter(ThermalAdapter):
     """Skeleton for vendor SDK integration.
 
     TODO: integrate vendor-specific SDK: initialize SDK, enumerate devices, open streams,
-    and convert frames to numpy arrays. Refer to vendor documentation and replace
+    and convert frames to numpy arrays. Return the radiometric data as
+    ``ThermalFrame(temperature_matrix=...)`` and set ``palette`` with the
+    camera's temperature range. Refer to vendor documentation and replace
     NotImplementedError sections.
     """
 
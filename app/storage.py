@@ -1,8 +1,15 @@
 from __future__ import annotations
+import itertools
+import logging
 import sqlite3
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
+from operator import itemgetter
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 DB_SCHEMA = """
 CREATE TABLE IF NOT EXISTS users (
@@ -52,6 +59,39 @@ CREATE TABLE IF NOT EXISTS labels_over_time (
 """
 
 
+# Applied in order on top of DB_SCHEMA; PRAGMA user_version holds the count applied.
+MIGRATIONS = [
+    # covering index: score series for a session/time window never touch the table
+    "CREATE INDEX IF NOT EXISTS idx_labels_session_ts ON labels_over_time(session_id, timestamp_ms, score, label);",
+    "CREATE INDEX IF NOT EXISTS idx_segments_session_start ON segments(session_id, start_ms, end_ms);",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id, started_at);",
+]
+
+SCORE_DTYPE = np.dtype([("timestamp_ms", "<i8"), ("score", "<f4"), ("label", "<U6")])
+SEGMENT_DTYPE = np.dtype(
+    [
+        ("id", "<i8"),
+        ("type", "<U16"),
+        ("question_id", "<i8"),
+        ("start_ms", "<i8"),
+        ("end_ms", "<i8"),
+        ("label", "<U6"),
+    ]
+)
+AGGREGATE_DTYPE = np.dtype(
+    [
+        ("session_id", "<i8"),
+        ("frames", "<i8"),
+        ("first_ms", "<i8"),
+        ("last_ms", "<i8"),
+        ("mean_score", "<f4"),
+        ("min_score", "<f4"),
+        ("max_score", "<f4"),
+        ("lie_fraction", "<f4"),
+    ]
+)
+
+
 @dataclass
 class User:
     id: int
@@ -59,18 +99,113 @@ class User:
     voiceprint: bytes | None = None
 
 
+@dataclass
+class Session:
+    id: int
+    user_id: int
+    folder: str
+    started_at: str
+    finished_at: str | None = None
+
+
+INSERT_LABEL = "INSERT INTO labels_over_time(session_id, timestamp_ms, score, label) VALUES (?, ?, ?, ?)"
+INSERT_SEGMENT = (
+    "INSERT INTO segments(id, session_id, type, question_id, start_ms, end_ms, label, notes)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+CLOSE_SEGMENT = "UPDATE segments SET end_ms=? WHERE id=?"
+# segment ids reserved per round trip to the database
+SEGMENT_ID_BLOCK = 64
+
+
 class Storage:
-    def __init__(self, db_path: Path):
+    """SQLite access over one long-lived WAL connection.
+
+    High-rate writes (``log_label``, ``add_segment``, ``close_segment``) are
+    queued and written by a background thread in ``executemany`` batches,
+    once ``flush_rows`` rows are pending or every ``flush_interval`` seconds.
+    Every other statement flushes the queue first, so reads always see the
+    pending writes. A batch that fails stays queued and is retried; ``close``
+    raises if it still cannot be written.
+    """
+
+    def __init__(self, db_path: Path, flush_rows: int = 500, flush_interval: float = 1.0):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
         self._init_db()
+        self._id_lock = threading.Lock()
+        self._next_segment_id = self._segment_ids_end = 0
+        self._writer = threading.Thread(target=self._write_behind, daemon=True)
+        self._writer.start()
 
+    @contextmanager
     def _connect(self):
-        return sqlite3.connect(self.db_path)
+        with self._lock:
+            self.flush()
+            with self._conn:
+                yield self._conn
 
     def _init_db(self):
         with self._connect() as conn:
             conn.executescript(DB_SCHEMA)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for idx, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                conn.executescript(script)
+                conn.execute(f"PRAGMA user_version={idx}")
+
+    def _enqueue(self, sql: str, params: tuple):
+        with self._pending_lock:
+            self._pending.append((sql, params))
+            pending = len(self._pending)
+        if pending >= self.flush_rows:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                with self._conn:
+                    for sql, group in itertools.groupby(batch, key=itemgetter(0)):
+                        self._conn.executemany(sql, [params for _, params in group])
+            except sqlite3.Error:
+                # the transaction was rolled back: requeue ahead of newer rows and retry later
+                with self._pending_lock:
+                    self._pending[:0] = batch
+                raise
+
+    def _write_behind(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logging.exception("Storage write-behind flush failed")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        try:
+            # rows that still cannot be written surface here instead of being dropped
+            self.flush()
+        finally:
+            self._conn.close()
 
     def list_users(self) -> list[User]:
         with self._connect() as conn:
@@ -111,6 +246,14 @@ class Storage:
             )
             conn.commit()
 
+    def find_session(self, folder: Path) -> int | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM sessions WHERE folder IN (?, ?) ORDER BY id DESC LIMIT 1",
+                (str(folder), str(folder.resolve())),
+            ).fetchone()
+            return row[0] if row else None
+
     def add_question(self, session_id: int, text: str, source: str = "manual") -> int:
         with self._connect() as conn:
             cur = conn.execute(
@@ -120,6 +263,16 @@ class Storage:
             conn.commit()
             return cur.lastrowid
 
+    def add_questions(self, session_id: int, texts: Sequence[str], source: str = "manual") -> list[int]:
+        """Inserts a whole questionnaire in one transaction; ids in the order of ``texts``."""
+        with self._connect() as conn:
+            ids = [
+                conn.execute("INSERT INTO questions(session_id, text, source) VALUES (?, ?, ?)", (session_id, text, source)).lastrowid
+                for text in texts
+            ]
+            conn.commit()
+            return ids
+
     def add_segment(
         self,
         session_id: int,
@@ -130,27 +283,119 @@ class Storage:
         question_id: int | None = None,
         notes: str | None = None,
     ) -> int:
+        # ids are assigned here so the insert can be deferred to the writer thread
+        with self._id_lock:
+            if self._next_segment_id == self._segment_ids_end:
+                self._next_segment_id = self._reserve_segment_ids(SEGMENT_ID_BLOCK)
+                self._segment_ids_end = self._next_segment_id + SEGMENT_ID_BLOCK
+            segment_id = self._next_segment_id
+            self._next_segment_id += 1
+        self._enqueue(INSERT_SEGMENT, (segment_id, session_id, type_, question_id, start_ms, end_ms, label, notes))
+        return segment_id
+
+    def _reserve_segment_ids(self, count: int) -> int:
+        """First of ``count`` segment ids no other connection will hand out.
+
+        The AUTOINCREMENT counter in ``sqlite_sequence`` is advanced under a
+        write lock, so other processes (recover, a second app instance) get
+        ids above the reserved block and plain inserts never reuse them.
+        """
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='segments'").fetchone()
+                top = conn.execute("SELECT COALESCE(MAX(id), 0) FROM segments").fetchone()[0]
+                first = max(row[0] if row else 0, top) + 1
+                if row:
+                    conn.execute("UPDATE sqlite_sequence SET seq=? WHERE name='segments'", (first + count - 1,))
+                else:
+                    conn.execute("INSERT INTO sqlite_sequence(name, seq) VALUES ('segments', ?)", (first + count - 1,))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            return first
+
+    def close_segment(self, segment_id: int, end_ms: int):
+        self._enqueue(CLOSE_SEGMENT, (end_ms, segment_id))
+
+    def log_label(self, session_id: int, timestamp_ms: int, score: float, label: str):
+        self._enqueue(INSERT_LABEL, (session_id, timestamp_ms, score, label))
+
+    def replace_labels(self, session_id: int, rows: Iterable[tuple[int, float, str]]):
         with self._connect() as conn:
-            cur = conn.execute(
+            conn.execute("DELETE FROM labels_over_time WHERE session_id=?", (session_id,))
+            conn.executemany(INSERT_LABEL, ((session_id, ts, score, label) for ts, score, label in rows))
+            conn.commit()
+
+    def replace_segments(self, session_id: int, rows: Iterable[tuple]):
+        """Replaces all segments of a session with ``(type, question_id, start_ms, end_ms, label, notes)`` rows."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM segments WHERE session_id=?", (session_id,))
+            conn.executemany(
                 "INSERT INTO segments(session_id, type, question_id, start_ms, end_ms, label, notes)"
                 " VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (session_id, type_, question_id, start_ms, end_ms, label, notes),
+                ((session_id, *row) for row in rows),
             )
             conn.commit()
-            return cur.lastrowid
 
-    def close_segment(self, segment_id: int, end_ms: int):
+    def get_session(self, session_id: int) -> Session | None:
         with self._connect() as conn:
-            conn.execute(
-                "UPDATE segments SET end_ms=? WHERE id=?",
-                (end_ms, segment_id),
+            row = conn.execute(
+                "SELECT id, user_id, folder, started_at, finished_at FROM sessions WHERE id=?",
+                (session_id,),
+            ).fetchone()
+            return Session(*row) if row else None
+
+    def list_sessions(self, user_id: int | None = None) -> list[Session]:
+        with self._connect() as conn:
+            if user_id is None:
+                cur = conn.execute("SELECT id, user_id, folder, started_at, finished_at FROM sessions ORDER BY id")
+            else:
+                cur = conn.execute(
+                    "SELECT id, user_id, folder, started_at, finished_at FROM sessions WHERE user_id=? ORDER BY started_at",
+                    (user_id,),
+                )
+            return [Session(*row) for row in cur.fetchall()]
+
+    def score_series(self, session_id: int, start_ms: int | None = None, end_ms: int | None = None) -> np.ndarray:
+        """Scores of a session in ``[start_ms, end_ms)`` as a SCORE_DTYPE array ordered by time."""
+        lo = start_ms if start_ms is not None else -(2**63)
+        hi = end_ms if end_ms is not None else 2**63 - 1
+        with self._connect() as conn:
+            cur = conn.execute(
+                "SELECT timestamp_ms, score, label FROM labels_over_time"
+                " WHERE session_id=? AND timestamp_ms >= ? AND timestamp_ms < ? ORDER BY timestamp_ms",
+                (session_id, lo, hi),
             )
-            conn.commit()
+            return np.fromiter(cur, dtype=SCORE_DTYPE)
 
-    def log_label(self, session_id: int, timestamp_ms: int, score: float, label: str):
+    def segments_overlapping(self, session_id: int, start_ms: int, end_ms: int) -> np.ndarray:
+        """Segments intersecting ``[start_ms, end_ms)``; open segments count as instants.
+
+        Missing ``question_id``/``end_ms`` are returned as -1.
+        """
         with self._connect() as conn:
-            conn.execute(
-                "INSERT INTO labels_over_time(session_id, timestamp_ms, score, label) VALUES (?, ?, ?, ?)",
-                (session_id, timestamp_ms, score, label),
+            cur = conn.execute(
+                "SELECT id, type, COALESCE(question_id, -1), start_ms, COALESCE(end_ms, -1), COALESCE(label, '')"
+                " FROM segments WHERE session_id=? AND start_ms < ? AND COALESCE(end_ms, start_ms) >= ?"
+                " ORDER BY start_ms",
+                (session_id, end_ms, start_ms),
             )
-            conn.commit()
+            return np.fromiter(cur, dtype=SEGMENT_DTYPE)
+
+    def session_aggregates(self, session_ids: Sequence[int] | None = None) -> np.ndarray:
+        """Per-session frame count, time span and score statistics as an AGGREGATE_DTYPE array."""
+        query = (
+            "SELECT session_id, COUNT(*), MIN(timestamp_ms), MAX(timestamp_ms),"
+            " AVG(score), MIN(score), MAX(score), AVG(label = 'Ложь')"
+            " FROM labels_over_time"
+        )
+        params: tuple = ()
+        if session_ids is not None:
+            query += f" WHERE session_id IN ({', '.join('?' * len(session_ids))})"
+            params = tuple(session_ids)
+        query += " GROUP BY session_id ORDER BY session_id"
+        with self._connect() as conn:
+            return np.fromiter(conn.execute(query, params), dtype=AGGREGATE_DTYPE)
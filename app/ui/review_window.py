@@ -1,56 +1,317 @@
 from __future__ import annotations
+import json
+import logging
 from pathlib import Path
-from typing import List
-from PySide6 import QtCore, QtWidgets
+from typing import List, Optional, Sequence
 
-from app.utils.exporter import QARecord, export_qa
-from app.utils.timeline import TimelineEntry
+import numpy as np
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from app.services.playback import AudioBlockReader, RawFrameSource, SessionPlayer, VideoFrameSource
+from app.ui.score_chart import ScoreChart
+from app.ui.table_models import QARecordModel
+from app.utils.aggregation import NOT_REACHED
+from app.utils.exporter import EXPORT_FORMATS, QARecord, export_session
+from app.utils.frame_index import FrameIndex
+from app.utils.rawstream import open_raw_stream
+from app.utils.timeline import SegmentEntry, Timeline, load_segments
+
+
+class ExportWorker(QtCore.QThread):
+    """Writes the session export off the GUI thread, reporting rows written."""
+
+    progress = QtCore.Signal(int, int)
+    done = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+
+    def __init__(
+        self,
+        folder: Path,
+        fmt: str,
+        records: List[QARecord],
+        timeline: Timeline,
+        segments: Sequence[SegmentEntry],
+    ):
+        super().__init__()
+        self.folder = folder
+        self.fmt = fmt
+        self.records = records
+        self.timeline = timeline
+        self.segments = segments
+
+    def run(self):
+        try:
+            paths = export_session(
+                self.folder, self.fmt, self.records, self.timeline, self.segments, progress=self.progress.emit
+            )
+        except Exception as exc:
+            logging.exception("Export of %s failed", self.folder)
+            self.failed.emit(str(exc))
+            return
+        self.done.emit(paths)
 
 
 class ReviewWindow(QtWidgets.QWidget):
-    def __init__(self, session_folder: Path, timeline: List[TimelineEntry]):
+    """Session review: QA table plus synchronized thermal video and audio.
+
+    Everything runs on the session clock of the timeline: the slider, the
+    frame on screen (``FrameIndex``), the label and score under the picture,
+    the score chart's playhead and the highlighted QA row all follow the
+    player's playhead; clicking a row or the chart seeks.
+    """
+
+    def __init__(self, session_folder: Path, timeline: Timeline):
         super().__init__()
         self.session_folder = session_folder
         self.timeline = timeline
+        self.qa_model = QARecordModel(self)
+        self._shown_frame = -1
+        self._export_worker: ExportWorker | None = None
         self.setWindowTitle("Разбор сессии")
+        self._open_media()
         self._build_ui()
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self._release_media)
+
+    def _open_media(self):
+        self.index: Optional[FrameIndex] = None
+        self.source: VideoFrameSource | RawFrameSource | None = None
+        raw = open_raw_stream(self.session_folder)
+        video = self.session_folder / "thermal_view.mp4"
+        try:
+            if raw is not None and len(raw):
+                # exact timestamps and O(1) seeks, no decoding
+                self.index = FrameIndex(raw.timestamps)
+                self.source = RawFrameSource(raw)
+            elif video.exists():
+                self.index = FrameIndex.for_session(self.session_folder, self.timeline)
+                self.source = VideoFrameSource(video) if self.index is not None else None
+        except (OSError, RuntimeError, ValueError):
+            logging.exception("Cannot open session video %s", self.session_folder)
+            self.index = self.source = None
+        audio = None
+        audio_path = self.session_folder / "audio.wav"
+        if audio_path.exists():
+            try:
+                audio = AudioBlockReader(audio_path)
+            except Exception:
+                logging.exception("Cannot open %s", audio_path)
+        if self.index is not None:
+            start_ms, end_ms = self.index.start_ms, self.index.end_ms
+        elif len(self.timeline):
+            start_ms, end_ms = int(self.timeline.timestamps[0]), int(self.timeline.timestamps[-1])
+        else:
+            start_ms = end_ms = 0
+        if audio is not None and self.index is None and not len(self.timeline):
+            end_ms = int(audio.frames * 1000 / audio.samplerate)
+        self.player = SessionPlayer(start_ms, end_ms, audio, self._audio_start_ms(start_ms))
+
+    def _audio_start_ms(self, default: int) -> int:
+        stats_path = self.session_folder / "session_stats.json"
+        try:
+            start = json.loads(stats_path.read_text()).get("audio", {}).get("start_ms")
+        except (OSError, ValueError):
+            start = None
+        # sessions recorded before the audio start was stored: assume it began with the first frame
+        return int(start) if start is not None else default
 
     def _build_ui(self):
         layout = QtWidgets.QVBoxLayout()
-        layout.addWidget(QtWidgets.QLabel("Разбор: синхронное воспроизведение аудио/видео упрощено в этой версии. Откройте файл thermal_view.mp4 и audio.wav в плеере."))
-        self.table = QtWidgets.QTableWidget(0, 6)
-        self.table.setHorizontalHeaderLabels(["#", "Вопрос", "Ответ (ASR)", "Итог", "Начало", "Конец"])
+        self.video = QtWidgets.QLabel()
+        self.video.setFixedSize(480, 320)
+        self.video.setAlignment(QtCore.Qt.AlignCenter)
+        self.video.setStyleSheet("background:#111;")
+        if self.source is None:
+            self.video.setText("Видео сессии не найдено")
+        layout.addWidget(self.video, alignment=QtCore.Qt.AlignHCenter)
+
+        player_layout = QtWidgets.QHBoxLayout()
+        self.play_btn = QtWidgets.QPushButton("▶")
+        self.position = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.position.setRange(0, max(self.player.end_ms - self.player.start_ms, 0))
+        self.time_label = QtWidgets.QLabel()
+        self.verdict_label = QtWidgets.QLabel("—")
+        self.verdict_label.setMinimumWidth(110)
+        player_layout.addWidget(self.play_btn)
+        player_layout.addWidget(self.position)
+        player_layout.addWidget(self.time_label)
+        player_layout.addWidget(self.verdict_label)
+        layout.addLayout(player_layout)
+
+        segments_path = self.session_folder / "segments.json"
+        self._has_segments = segments_path.exists()
+        self.segments: List[SegmentEntry] = load_segments(segments_path) if self._has_segments else []
+        self.chart = ScoreChart(self.timeline, self.segments if self._has_segments else None)
+        layout.addWidget(self.chart)
+
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.qa_model)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         layout.addWidget(self.table)
         btn_layout = QtWidgets.QHBoxLayout()
-        self.export_btn = QtWidgets.QPushButton("Экспорт в Excel")
+        self.export_format = QtWidgets.QComboBox()
+        for fmt, title in EXPORT_FORMATS.items():
+            self.export_format.addItem(title, fmt)
+        self.export_btn = QtWidgets.QPushButton("Экспорт")
+        self.export_progress = QtWidgets.QProgressBar()
+        self.export_progress.setVisible(False)
         self.open_folder_btn = QtWidgets.QPushButton("Открыть папку сессии")
+        btn_layout.addWidget(self.export_format)
         btn_layout.addWidget(self.export_btn)
+        btn_layout.addWidget(self.export_progress)
         btn_layout.addWidget(self.open_folder_btn)
         layout.addLayout(btn_layout)
         self.setLayout(layout)
         self.export_btn.clicked.connect(self._export)
         self.open_folder_btn.clicked.connect(self._open_folder)
+        self.play_btn.clicked.connect(self._toggle_play)
+        self.position.sliderMoved.connect(self._on_slider)
+        self.table.clicked.connect(self._on_row_clicked)
+        self.chart.position_clicked.connect(self.seek)
+
+        self._tick = QtCore.QTimer(self)
+        self._tick.setInterval(30)
+        self._tick.timeout.connect(self._update_playhead)
+        self._update_playhead()
 
     def load_records(self, records: List[QARecord]):
-        self.table.setRowCount(0)
-        for rec in records:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            for col, val in enumerate([rec.number, rec.question, rec.answer_text, rec.verdict, rec.start_ms, rec.end_ms]):
-                item = QtWidgets.QTableWidgetItem(str(val))
-                self.table.setItem(row, col, item)
-        self.records = records
+        self.qa_model.set_records(records)
+        if not self._has_segments:
+            self.chart.set_segments(
+                [
+                    SegmentEntry("qa", rec.start_ms, rec.end_ms, None, rec.question)
+                    for rec in records
+                    if rec.start_ms != NOT_REACHED
+                ]
+            )
+
+    @property
+    def records(self) -> List[QARecord]:
+        return self.qa_model.records()
+
+    def seek(self, ts_ms: int):
+        self.player.seek(ts_ms)
+        self._update_playhead()
+
+    def _toggle_play(self):
+        if self.player.playing:
+            self.player.pause()
+            self._tick.stop()
+            self.play_btn.setText("▶")
+        else:
+            if self.player.position_ms() >= self.player.end_ms:
+                self.player.seek(self.player.start_ms)
+            self.player.play()
+            self._tick.start()
+            self.play_btn.setText("⏸")
+
+    def _on_slider(self, value: int):
+        self.seek(self.player.start_ms + value)
+
+    def _on_row_clicked(self, index: QtCore.QModelIndex):
+        start = self.qa_model.value(index.row(), "start_ms")
+        if start != NOT_REACHED:
+            self.seek(start)
+
+    def _update_playhead(self):
+        pos = self.player.position_ms()
+        if pos >= self.player.end_ms and self.player.playing:
+            self._toggle_play()
+            self.player.seek(self.player.end_ms)
+            pos = self.player.end_ms
+        if not self.position.isSliderDown():
+            self.position.setValue(pos - self.player.start_ms)
+        elapsed = max(pos - self.player.start_ms, 0) // 1000
+        self.time_label.setText(f"{elapsed // 60:02d}:{elapsed % 60:02d}")
+        self.chart.set_playhead(pos)
+        self._show_frame(pos)
+        self._show_verdict(pos)
+        self._sync_row(pos)
+
+    def _show_frame(self, pos: int):
+        if self.source is None or self.index is None:
+            return
+        i = self.index.frame_at(pos)
+        if i == self._shown_frame:
+            return
+        image = self.source.frame(i)
+        self.source.prefetch(i + 1)
+        if image is None:
+            return
+        self._shown_frame = i
+        h, w = image.shape[:2]
+        qimg = QtGui.QImage(image.data, w, h, image.strides[0], QtGui.QImage.Format_BGR888)
+        pix = QtGui.QPixmap.fromImage(qimg).scaled(self.video.size(), QtCore.Qt.KeepAspectRatio)
+        self.video.setPixmap(pix)
+
+    def _show_verdict(self, pos: int):
+        if not len(self.timeline):
+            return
+        i = int(np.searchsorted(self.timeline.timestamps, pos, side="right")) - 1
+        i = max(i, 0)
+        self.verdict_label.setText(f"{self.timeline.label_at(i)} {self.timeline.scores[i]:.2f}")
+
+    def _sync_row(self, pos: int):
+        # unreached questions have no span; search the reached rows, which are in time order
+        reached = np.flatnonzero(self.qa_model.column("start_ms") != NOT_REACHED)
+        i = int(np.searchsorted(self.qa_model.column("start_ms")[reached], pos, side="right")) - 1
+        if i < 0:
+            return
+        row = int(reached[i])
+        if pos > self.qa_model.value(row, "end_ms"):
+            return
+        if self.table.currentIndex().row() != row:
+            self.qa_model.ensure_loaded(row)
+            self.table.selectRow(row)
+
+    def closeEvent(self, event: QtGui.QCloseEvent):
+        self._release_media()
+        if self._export_worker is not None:
+            self._export_worker.wait()
+        super().closeEvent(event)
+
+    def _release_media(self):
+        # the read-ahead decoder must be stopped before interpreter shutdown kills it mid-decode
+        self._tick.stop()
+        self.player.close()
+        if self.source is not None:
+            self.source.close()
+            self.source = None
 
     def _export(self):
-        if not hasattr(self, 'records'):
+        if not len(self.qa_model):
             QtWidgets.QMessageBox.warning(self, "Нет данных", "Нет строк для экспорта")
             return
-        path = self.session_folder / "qa.xlsx"
-        export_qa(self.records, path)
-        QtWidgets.QMessageBox.information(self, "Экспорт", f"Сохранено: {path}")
+        if self._export_worker is not None:
+            return
+        # rows are snapshotted here: the table stays editable while the file is written
+        worker = ExportWorker(
+            self.session_folder, self.export_format.currentData(), self.records, self.timeline, self.segments
+        )
+        worker.progress.connect(self._on_export_progress)
+        worker.done.connect(self._on_export_done)
+        worker.failed.connect(self._on_export_failed)
+        worker.finished.connect(self._on_export_finished)
+        self._export_worker = worker
+        self.export_btn.setEnabled(False)
+        self.export_progress.setRange(0, 0)
+        self.export_progress.setVisible(True)
+        worker.start()
 
-    def _open_folder(self):
-        QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(str(self.session_folder)))
+    def _on_export_progress(self, done: int, total: int):
+        self.export_progress.setRange(0, max(total, 1))
+        self.export_progress.setValue(done)
+
+    def _on_export_done(self, paths: List[Path]):
+        names = "\n".join(str(path) for path in paths)
+        QtWidgets.QMessageBox.information(self, "Экспорт", f"Сохранено:\n{names}")
+
+    def _on_export_failed(self, message: str):
+        QtWidgets.QMessageBox.critical(self, "Ошибка экспорта", message)
 
+    def _on_export_finished(self):
+        self._export_worker = None
+        self.export_btn.setEnabled(True)
+        self.export_progress.setVisible(False)
 
-from PySide6 import QtGui  # placed last
+    def _open_folder(self):
+        QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(str(self.session_folder)))
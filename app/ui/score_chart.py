@@ -0,0 +1,167 @@
+from __future__ import annotations
+from typing import List, Optional
+
+import numpy as np
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from app.utils.decimation import MinMaxPyramid
+from app.utils.timeline import SegmentEntry, Timeline
+
+MIN_SPAN_MS = 1000
+
+
+class ScoreChart(QtWidgets.QWidget):
+    """Score over time with question/answer segments and the playhead.
+
+    The score is drawn from a ``MinMaxPyramid`` at about one bin per pixel
+    column: at coarse zoom each column shows the min..max range of the
+    frames it covers, at fine zoom the samples themselves are joined. Wheel
+    zooms around the cursor, dragging pans, double-click shows the whole
+    session and a click emits ``position_clicked`` with the session time.
+    """
+
+    position_clicked = QtCore.Signal(int)
+
+    MARGIN = QtCore.QMargins(8, 16, 8, 18)
+
+    def __init__(self, timeline: Timeline, segments: Optional[List[SegmentEntry]] = None, parent: QtWidgets.QWidget | None = None):
+        super().__init__(parent)
+        self.pyramid = MinMaxPyramid(timeline.timestamps, timeline.scores)
+        self.segments = segments or []
+        if len(timeline):
+            self.full_start, self.full_end = int(timeline.timestamps[0]), int(timeline.timestamps[-1])
+        else:
+            self.full_start, self.full_end = 0, MIN_SPAN_MS
+        self.full_end = max(self.full_end, self.full_start + MIN_SPAN_MS)
+        self.view_start, self.view_end = self.full_start, self.full_end
+        self.playhead: Optional[int] = None
+        self._press: Optional[tuple[float, int]] = None
+        self._dragged = False
+        self.setMinimumHeight(140)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Preferred)
+
+    def set_segments(self, segments: List[SegmentEntry]):
+        self.segments = segments
+        self.update()
+
+    def set_playhead(self, ts_ms: int):
+        if ts_ms == self.playhead:
+            return
+        self.playhead = ts_ms
+        span = self.view_end - self.view_start
+        if self._press is None and not self.view_start <= ts_ms <= self.view_end:
+            # follow playback a page at a time
+            self._set_view(ts_ms - span // 10, ts_ms - span // 10 + span)
+        self.update()
+
+    def zoom(self, factor: float, anchor_ms: int):
+        span = max((self.view_end - self.view_start) * factor, MIN_SPAN_MS)
+        left = (anchor_ms - self.view_start) / max(self.view_end - self.view_start, 1)
+        start = anchor_ms - left * span
+        self._set_view(int(start), int(start + span))
+
+    def reset_view(self):
+        self._set_view(self.full_start, self.full_end)
+
+    def _set_view(self, start: int, end: int):
+        span = min(max(end - start, MIN_SPAN_MS), self.full_end - self.full_start)
+        start = min(max(start, self.full_start), self.full_end - span)
+        self.view_start, self.view_end = start, start + span
+        self.update()
+
+    def _plot_rect(self) -> QtCore.QRectF:
+        return QtCore.QRectF(self.rect().marginsRemoved(self.MARGIN))
+
+    def _to_ms(self, x: float) -> int:
+        plot = self._plot_rect()
+        return int(self.view_start + (x - plot.left()) * (self.view_end - self.view_start) / max(plot.width(), 1))
+
+    def _to_x(self, ts_ms: float) -> float:
+        plot = self._plot_rect()
+        return plot.left() + (ts_ms - self.view_start) * plot.width() / (self.view_end - self.view_start)
+
+    def paintEvent(self, event: QtGui.QPaintEvent):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor("#111"))
+        plot = self._plot_rect()
+        painter.setClipRect(plot.adjusted(0, -self.MARGIN.top(), 0, 0))
+        self._paint_segments(painter, plot)
+        self._paint_scores(painter, plot)
+        if self.playhead is not None and self.view_start <= self.playhead <= self.view_end:
+            x = self._to_x(self.playhead)
+            painter.setPen(QtGui.QPen(QtGui.QColor("#e33"), 1))
+            painter.drawLine(QtCore.QPointF(x, plot.top()), QtCore.QPointF(x, plot.bottom()))
+        painter.setClipping(False)
+        painter.setPen(QtGui.QColor("#888"))
+        for ts, align in ((self.view_start, QtCore.Qt.AlignLeft), (self.view_end, QtCore.Qt.AlignRight)):
+            seconds = (ts - self.full_start) // 1000
+            text = f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+            painter.drawText(self.rect().adjusted(self.MARGIN.left(), 0, -self.MARGIN.right(), 0), align | QtCore.Qt.AlignBottom, text)
+        painter.end()
+
+    def _paint_segments(self, painter: QtGui.QPainter, plot: QtCore.QRectF):
+        for seg in self.segments:
+            end = seg.end_ms if seg.end_ms is not None else self.full_end
+            if end < self.view_start or seg.start_ms > self.view_end:
+                continue
+            x0, x1 = self._to_x(seg.start_ms), self._to_x(end)
+            if seg.type == "qa":
+                painter.fillRect(QtCore.QRectF(x0, plot.top(), max(x1 - x0, 1), plot.height()), QtGui.QColor(70, 110, 200, 60))
+                if seg.question_text and x1 - x0 > 40:
+                    painter.setPen(QtGui.QColor("#9bd"))
+                    painter.drawText(QtCore.QRectF(x0 + 2, 0, x1 - x0 - 4, self.MARGIN.top()), QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter, seg.question_text)
+            else:
+                painter.setPen(QtGui.QPen(QtGui.QColor("#d90"), 1, QtCore.Qt.DashLine))
+                painter.drawLine(QtCore.QPointF(x0, plot.top()), QtCore.QPointF(x0, plot.bottom()))
+
+    def _paint_scores(self, painter: QtGui.QPainter, plot: QtCore.QRectF):
+        env = self.pyramid.envelope(self.view_start, self.view_end, max(int(plot.width()), 1))
+        if not len(env):
+            return
+        xs = plot.left() + (env.timestamps - self.view_start) * (plot.width() / (self.view_end - self.view_start))
+        lo = plot.bottom() - np.clip(env.mins, 0, 1) * plot.height()
+        hi = plot.bottom() - np.clip(env.maxs, 0, 1) * plot.height()
+        painter.setPen(QtGui.QPen(QtGui.QColor("#6c6"), 1))
+        if np.array_equal(lo, hi):
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            painter.drawPolyline(_polygon(xs, lo))
+        else:
+            # the band between the bins' maxima and minima, so no column is left empty
+            painter.setBrush(QtGui.QColor("#6c6"))
+            painter.drawPolygon(_polygon(np.concatenate((xs, xs[::-1])), np.concatenate((hi, lo[::-1]))))
+
+    def wheelEvent(self, event: QtGui.QWheelEvent):
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.zoom(0.8**steps, self._to_ms(event.position().x()))
+        event.accept()
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent):
+        if event.button() == QtCore.Qt.LeftButton:
+            self._press = (event.position().x(), self.view_start)
+            self._dragged = False
+
+    def mouseMoveEvent(self, event: QtGui.QMouseEvent):
+        if self._press is None:
+            return
+        x0, start = self._press
+        dx = event.position().x() - x0
+        if abs(dx) >= 3:
+            self._dragged = True
+        if self._dragged:
+            ms_per_px = (self.view_end - self.view_start) / max(self._plot_rect().width(), 1)
+            span = self.view_end - self.view_start
+            new_start = int(start - dx * ms_per_px)
+            self._set_view(new_start, new_start + span)
+
+    def mouseReleaseEvent(self, event: QtGui.QMouseEvent):
+        if self._press is not None and not self._dragged and event.button() == QtCore.Qt.LeftButton:
+            self.position_clicked.emit(min(max(self._to_ms(event.position().x()), self.full_start), self.full_end))
+        self._press = None
+
+    def mouseDoubleClickEvent(self, event: QtGui.QMouseEvent):
+        self.reset_view()
+
+
+def _polygon(xs: np.ndarray, ys: np.ndarray) -> QtGui.QPolygonF:
+    return QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in zip(xs.tolist(), ys.tolist())])
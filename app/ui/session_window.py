@@ -1,58 +1,102 @@
 from __future__ import annotations
 import json
+import logging
+import queue
 import subprocess
 import time
+from dataclasses import replace
 from pathlib import Path
-from typing import List
+from datetime import datetime
+from typing import Callable, List
 
-import cv2
 import numpy as np
 from PySide6 import QtCore, QtGui, QtWidgets
 
 from app.config import AppConfig
 from app.services.audio import AudioRecorder
 from app.services.deception import DeceptionService
-from app.services.thermal_adapters import DummyThermalAdapter, FileThermalAdapter, ThermalAdapter, ThermalFrame
+from app.services.encoder import VideoEncoder, create_encoder
+from app.services.pipeline import CapturePipeline
+from app.services.queues import QueueClosed
+from app.services.raw_recorder import RawRecorder, create_raw_recorder
+from app.services.thermal_adapters import (
+    DummyThermalAdapter,
+    FileThermalAdapter,
+    SyntheticThermalAdapter,
+    ThermalAdapter,
+    ThermalFrame,
+)
 from app.storage import Storage, User
-from app.utils.timeline import TimelineEntry, save_timeline
+from app.ui.table_models import QuestionListModel
+from app.utils.frame_index import VIDEO_INDEX_FILE, FrameIndex
+from app.utils.journal import SessionJournal
+from app.utils.questions import load_questions
+from app.utils.rawstream import RAW_DIR
+from app.utils.timeline import SegmentEntry, Timeline, save_segments, save_timeline
 from app.utils.exporter import export_qa, QARecord
 
 
 class FrameWorker(QtCore.QThread):
-    frame_captured = QtCore.Signal(np.ndarray, int, str, float)
+    """Preview stage of the capture pipeline.
+
+    Capture, inference and encoding run on the pipeline's own threads; this
+    worker only drains the preview queue and forwards frames to the GUI,
+    which releases each ``ThermalFrame`` once it has been drawn.
+    """
+
+    frame_captured = QtCore.Signal(object, int, str, float)
     error = QtCore.Signal(str)
 
-    def __init__(self, adapter: ThermalAdapter, deception: DeceptionService, frame_rate: int = 15):
+    def __init__(
+        self,
+        adapter: ThermalAdapter,
+        deception: DeceptionService,
+        config: AppConfig,
+        encoder: VideoEncoder | None = None,
+        raw_recorder: RawRecorder | None = None,
+        on_result: Callable[[int, str, float, bool], None] | None = None,
+    ):
         super().__init__()
-        self.adapter = adapter
-        self.deception = deception
-        self.frame_rate = frame_rate
-        self._running = False
-        self._last_frame = None
-        self.timeline: List[TimelineEntry] = []
+        self.pipeline = CapturePipeline(
+            adapter,
+            deception,
+            frame_rate=config.frame_rate,
+            catch_up_frames=config.catch_up_frames,
+            encoder=encoder,
+            raw_recorder=raw_recorder,
+            on_result=on_result,
+            capture_queue=config.capture_queue,
+            preview_queue=config.preview_queue,
+            capture_policy=config.capture_policy,
+            preview_policy=config.preview_policy,
+            max_batch=config.max_batch,
+            batch_latency_ms=config.batch_latency_ms,
+        )
+
+    @property
+    def timeline(self) -> Timeline:
+        return self.pipeline.timeline
 
     def run(self):
-        self._running = True
-        interval = 1.0 / self.frame_rate
-        while self._running:
+        self.pipeline.start()
+        while True:
             try:
-                frame = self.adapter.read_frame()
-                ts_ms = int(time.monotonic() * 1000)
-                label, score = self.deception.infer(frame, ts_ms)
-                self.timeline.append(TimelineEntry(timestamp_ms=ts_ms, label=label, score=score))
-                self._last_frame = frame.frame
-                self.frame_captured.emit(frame.frame, ts_ms, label, score)
-                time.sleep(interval)
-            except Exception as exc:
-                self.error.emit(str(exc))
+                frame, ts_ms, label, score = self.pipeline.get_preview(timeout=0.1)
+            except queue.Empty:
+                continue
+            except QueueClosed:
                 break
+            self.frame_captured.emit(frame, ts_ms, label, score)
+        self.pipeline.join()
+        if self.pipeline.error:
+            self.error.emit(self.pipeline.error)
 
     def stop(self):
-        self._running = False
+        self.pipeline.stop()
 
 
 class SessionWindow(QtWidgets.QWidget):
-    recording_stopped = QtCore.Signal(Path, List[TimelineEntry])
+    recording_stopped = QtCore.Signal(object, object)
 
     def __init__(self, storage: Storage, user: User, config: AppConfig, file_adapter_path: Path):
         super().__init__()
@@ -67,7 +111,14 @@ class SessionWindow(QtWidgets.QWidget):
         self.audio_recorder = AudioRecorder(samplerate=config.audio_rate)
         self.session_folder: Path | None = None
         self.qa_records: List[QARecord] = []
-        self.video_writer = None
+        self.session_id: int | None = None
+        self.journal: SessionJournal | None = None
+        self.segments: List[SegmentEntry] = []
+        self._open_segment: tuple[int, SegmentEntry] | None = None
+        self.session_questions: List[str] = []
+        self._question_ids: List[int] = []
+        self._question_index = 0
+        self._preview_buffer: np.ndarray | None = None
 
         self._build_ui()
         self._setup_connections()
@@ -77,7 +128,7 @@ class SessionWindow(QtWidgets.QWidget):
 
         device_layout = QtWidgets.QHBoxLayout()
         self.thermal_combo = QtWidgets.QComboBox()
-        self.thermal_combo.addItems(["Dummy (webcam)", "Файл (sample/sample.mp4)"])
+        self.thermal_combo.addItems(["Dummy (webcam)", "Файл (sample/sample.mp4)", "Синтетический (нагрузочный тест)"])
         self.thermal_check = QtWidgets.QPushButton("Проверить")
         self.instruction_btn = QtWidgets.QPushButton("Инструкция")
         device_layout.addWidget(QtWidgets.QLabel("Тепловизор"))
@@ -108,8 +159,11 @@ class SessionWindow(QtWidgets.QWidget):
         folder_layout.addWidget(self.folder_btn)
 
         questions_layout = QtWidgets.QHBoxLayout()
-        self.questions_table = QtWidgets.QTableWidget(0, 1)
-        self.questions_table.setHorizontalHeaderLabels(["Вопрос"])
+        self.questions_model = QuestionListModel(self)
+        self.questions_table = QtWidgets.QTableView()
+        self.questions_table.setModel(self.questions_model)
+        self.questions_table.horizontalHeader().setStretchLastSection(True)
+        self.questions_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.add_question_btn = QtWidgets.QPushButton("Добавить")
         self.remove_question_btn = QtWidgets.QPushButton("Удалить")
         self.import_btn = QtWidgets.QPushButton("Импорт txt/xlsx")
@@ -130,6 +184,8 @@ class SessionWindow(QtWidgets.QWidget):
         self.rec_indicator.setStyleSheet("color: red; font-weight: bold;")
         self.rec_indicator.hide()
         self.timer_label = QtWidgets.QLabel("00:00")
+        self.queue_label = QtWidgets.QLabel("")
+        self.queue_label.setStyleSheet("color:#888;")
         self.truth_label = QtWidgets.QLabel("—")
         self.truth_label.setAlignment(QtCore.Qt.AlignCenter)
         self.truth_label.setStyleSheet("font-size:32px; border:1px solid #444; padding:8px;")
@@ -139,6 +195,7 @@ class SessionWindow(QtWidgets.QWidget):
         right_layout.addWidget(self.rec_btn)
         right_layout.addWidget(self.rec_indicator)
         right_layout.addWidget(self.timer_label)
+        right_layout.addWidget(self.queue_label)
         right_layout.addWidget(self.truth_label)
         right_layout.addWidget(self.next_question_btn)
         right_layout.addWidget(self.answer_end_btn)
@@ -165,11 +222,14 @@ class SessionWindow(QtWidgets.QWidget):
         self.audio_check.clicked.connect(self._check_audio)
         self.folder_btn.clicked.connect(self._choose_folder)
         self.rec_btn.clicked.connect(self._toggle_recording)
-        self.next_question_btn.clicked.connect(lambda: self._log_event("Вопрос зафиксирован"))
-        self.answer_end_btn.clicked.connect(lambda: self._log_event("Ответ завершен"))
-        self.event_btn.clicked.connect(lambda: self._log_event("Метка события"))
+        self.next_question_btn.clicked.connect(self._next_question)
+        self.answer_end_btn.clicked.connect(self._end_answer)
+        self.event_btn.clicked.connect(self._mark_event)
         self.audio_recorder.level_callback = self._on_audio_level
         self.instruction_btn.clicked.connect(self._show_instruction)
+        self.add_question_btn.clicked.connect(self._add_question)
+        self.remove_question_btn.clicked.connect(self._remove_questions)
+        self.import_btn.clicked.connect(self._import_questions)
 
     def _check_thermal(self):
         self._start_adapter()
@@ -185,6 +245,28 @@ class SessionWindow(QtWidgets.QWidget):
         QtCore.QTimer.singleShot(5000, rec.stop)
         self._log_event("Проверка аудио 5 секунд")
 
+    def _add_question(self):
+        row = self.questions_model.add_question()
+        index = self.questions_model.index(row, 0)
+        self.questions_table.scrollTo(index)
+        self.questions_table.edit(index)
+
+    def _remove_questions(self):
+        rows = [index.row() for index in self.questions_table.selectionModel().selectedRows()]
+        self.questions_model.remove_rows(rows)
+
+    def _import_questions(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Импорт вопросов", "", "Вопросы (*.txt *.xlsx)")
+        if not path:
+            return
+        try:
+            imported = load_questions(Path(path))
+        except Exception as exc:
+            QtWidgets.QMessageBox.warning(self, "Импорт", f"Не удалось прочитать {path}: {exc}")
+            return
+        self.questions_model.set_questions(self.questions_model.questions() + imported)
+        self._log_event(f"Импортировано вопросов: {len(imported)}")
+
     def _choose_folder(self):
         path = QtWidgets.QFileDialog.getExistingDirectory(self, "Папка сессии")
         if path:
@@ -195,11 +277,37 @@ class SessionWindow(QtWidgets.QWidget):
         if choice == 0:
             self.adapter = DummyThermalAdapter()
             device = "0"
-        else:
-            self.adapter = FileThermalAdapter(self.file_adapter_path)
+        elif choice == 1:
+            self.adapter = FileThermalAdapter(
+                self.file_adapter_path,
+                loop=self.config.replay_loop,
+                realtime=self.config.replay_realtime,
+                prefetch=self.config.replay_prefetch,
+            )
             device = str(self.file_adapter_path)
+        else:
+            self.adapter = SyntheticThermalAdapter(
+                width=self.config.synthetic_width,
+                height=self.config.synthetic_height,
+                dtype=self.config.synthetic_dtype,
+                fps=self.config.synthetic_fps,
+                blobs=self.config.synthetic_blobs,
+                noise=self.config.synthetic_noise,
+                seed=self.config.synthetic_seed,
+                spike_every=self.config.synthetic_spike_every,
+                spike_ms=self.config.synthetic_spike_ms,
+                spike_jitter=self.config.synthetic_spike_jitter,
+                realtime=self.config.synthetic_realtime,
+            )
+            device = "synthetic"
         self.adapter.open(device)
 
+    def _session_config(self) -> AppConfig:
+        # sources with a native rate are captured and recorded at that rate
+        if self.adapter is not None and self.adapter.frame_rate:
+            return replace(self.config, frame_rate=int(round(self.adapter.frame_rate)))
+        return self.config
+
     def _toggle_recording(self):
         if self.frame_worker and self.frame_worker.isRunning():
             self._stop_recording()
@@ -222,10 +330,29 @@ class SessionWindow(QtWidgets.QWidget):
         self._timer = QtCore.QTimer()
         self._timer.timeout.connect(self._update_timer)
         self._timer.start(500)
-        self.deception_service = DeceptionService(self.config)
-        self.frame_worker = FrameWorker(self.adapter, self.deception_service, self.config.frame_rate)
+        self.session_id = self.storage.create_session(self.user.id, folder, datetime.now().isoformat(timespec="seconds"))
+        self.segments = []
+        self._open_segment = None
+        self._question_index = 0
+        self.session_questions = self.questions_model.questions()
+        self._question_ids = self.storage.add_questions(self.session_id, self.session_questions)
+        config = self._session_config()
+        self.deception_service = DeceptionService(config)
+        self.deception_service.warmup()
+        encoder = create_encoder(folder / "thermal_view.mp4", config)
+        raw_recorder = create_raw_recorder(folder / RAW_DIR, config) if config.raw_recording else None
+        self.journal = SessionJournal(folder)
+        self.frame_worker = FrameWorker(
+            self.adapter,
+            self.deception_service,
+            config,
+            encoder=encoder,
+            raw_recorder=raw_recorder,
+            on_result=self._make_result_sink(self.session_id, self.journal),
+        )
         self.frame_worker.frame_captured.connect(self._on_frame)
         self.frame_worker.error.connect(self._on_error)
+        self.frame_worker.finished.connect(self._on_worker_finished)
         self.frame_worker.start()
         audio_device = self.audio_combo.currentData()
         self.audio_recorder.start(str(folder / "audio.wav"), device_index=audio_device)
@@ -240,42 +367,129 @@ class SessionWindow(QtWidgets.QWidget):
         self.rec_indicator.hide()
         self.rec_btn.setText("Начать запись")
         self._timer.stop()
+        self._close_segment()
         self._log_event("Запись завершена")
+        if self.frame_worker:
+            stats = self.frame_worker.pipeline.stats()
+            logging.info("Pipeline stats: %s", stats)
+            pacing = stats["pacing"]
+            self._log_event(f"Кадров: {pacing['frames']}, {pacing['achieved_fps']:.1f} fps, джиттер {pacing['jitter_ms']:.1f} мс")
+            gating = stats["inference"]["gating"]
+            if gating is not None:
+                self._log_event(f"Пропущено без пересчёта: {gating['skip_ratio']:.0%} кадров")
+            raw = stats["raw"]
+            if raw is not None:
+                self._log_event(f"Сырые данные: {raw['frames']} кадров, {raw['bytes'] / 1e6:.1f} МБ")
         if self.session_folder and self.frame_worker:
-            save_timeline(self.frame_worker.timeline, self.session_folder / "timeline.json")
-        if self.video_writer is not None:
-            self.video_writer.release()
-            self.video_writer = None
-        self.recording_stopped.emit(self.session_folder, self.frame_worker.timeline if self.frame_worker else [])
+            save_timeline(self.frame_worker.timeline, self.session_folder / "timeline.npz")
+            if self.config.timeline_json:
+                save_timeline(self.frame_worker.timeline, self.session_folder / "timeline.json")
+            stats["audio"] = {"start_ms": self.audio_recorder.started_ms}
+            (self.session_folder / "session_stats.json").write_text(json.dumps(stats, indent=2))
+            encoder = self.frame_worker.pipeline.encoder
+            if encoder is not None:
+                # only frames that reached the file: the encode queue may drop, the encoder may fail
+                FrameIndex(encoder.timestamps).save(self.session_folder / VIDEO_INDEX_FILE)
+            save_segments(self.segments, self.session_folder / "segments.json")
+        if self.journal is not None:
+            # everything is saved by now, the journal is only needed after a crash
+            self.journal.close(remove=True)
+            self.journal = None
+        if self.session_id is not None:
+            self.storage.finish_session(self.session_id, datetime.now().isoformat(timespec="seconds"))
+            self.session_id = None
+        self.recording_stopped.emit(self.session_folder, self.frame_worker.timeline if self.frame_worker else Timeline())
+
+    def _make_result_sink(self, session_id: int, journal: SessionJournal) -> Callable[[int, str, float, bool], None]:
+        # called on the pipeline's inference thread for every scored frame
+        def sink(ts_ms: int, label: str, score: float, computed: bool):
+            journal.append(ts_ms, label, score, computed)
+            self.storage.log_label(session_id, ts_ms, score, label)
+
+        return sink
+
+    def _is_recording(self) -> bool:
+        return self.session_id is not None and self.frame_worker is not None and self.frame_worker.isRunning()
+
+    def _next_question(self):
+        self._log_event("Вопрос зафиксирован")
+        if not self._is_recording():
+            return
+        self._close_segment()
+        idx = self._question_index
+        self._question_index += 1
+        question = self.session_questions[idx] if idx < len(self.session_questions) else None
+        question_id = self._question_ids[idx] if idx < len(self._question_ids) else None
+        entry = SegmentEntry(type="qa", start_ms=self._now_ms(), end_ms=None, label=None, question_text=question)
+        segment_id = self.storage.add_segment(self.session_id, entry.type, entry.start_ms, None, question_id=question_id)
+        self.journal.open_segment(segment_id, entry, question_id)
+        self.segments.append(entry)
+        self._open_segment = (segment_id, entry)
+
+    def _end_answer(self):
+        self._log_event("Ответ завершен")
+        if self._is_recording():
+            self._close_segment()
+
+    def _mark_event(self):
+        self._log_event("Метка события")
+        if not self._is_recording():
+            return
+        now = self._now_ms()
+        entry = SegmentEntry(type="event", start_ms=now, end_ms=now, label=None, question_text=None)
+        segment_id = self.storage.add_segment(self.session_id, entry.type, now, now)
+        self.journal.open_segment(segment_id, entry)
+        self.segments.append(entry)
+
+    def _close_segment(self):
+        if self._open_segment is None:
+            return
+        segment_id, entry = self._open_segment
+        entry.end_ms = self._now_ms()
+        self.storage.close_segment(segment_id, entry.end_ms)
+        if self.journal is not None:
+            self.journal.close_segment(segment_id, entry.end_ms)
+        self._open_segment = None
+
+    @staticmethod
+    def _now_ms() -> int:
+        # same clock as the pipeline's frame timestamps
+        return int(time.monotonic() * 1000)
 
     def _update_timer(self):
         elapsed = int(time.monotonic() - self.start_time)
         self.timer_label.setText(f"{elapsed//60:02d}:{elapsed%60:02d}")
+        if self.frame_worker:
+            depths = self.frame_worker.pipeline.queue_depths()
+            self.queue_label.setText(" ".join(f"{name}:{depth}" for name, depth in depths.items()))
 
-    def _on_frame(self, frame: np.ndarray, ts_ms: int, label: str, score: float):
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        bytes_per_line = ch * w
-        qimg = QtGui.QImage(rgb.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
-        pix = QtGui.QPixmap.fromImage(qimg).scaled(self.preview.size(), QtCore.Qt.KeepAspectRatio)
+    def _on_frame(self, frame: ThermalFrame, ts_ms: int, label: str, score: float):
+        try:
+            # colour only as many pixels as the preview shows
+            target = QtCore.QSize(*frame.size).scaled(self.preview.size(), QtCore.Qt.KeepAspectRatio)
+            size = (target.width(), target.height()) if not target.isEmpty() else frame.size
+            image = frame.render(size, dst=self._preview_buffer)
+            if image is not frame.frame:
+                self._preview_buffer = image
+            h, w = image.shape[:2]
+            qimg = QtGui.QImage(image.data, w, h, 3 * w, QtGui.QImage.Format_BGR888)
+            # the pixmap is a copy, so the pooled buffer can go back right away
+            pix = QtGui.QPixmap.fromImage(qimg)
+        finally:
+            frame.release()
         self.preview.setPixmap(pix)
-        if self.session_folder:
-            if self.video_writer is None:
-                fourcc = cv2.VideoWriter_fourcc(*'H264')
-                writer = cv2.VideoWriter(str(self.session_folder / "thermal_view.mp4"), fourcc, self.config.frame_rate, (w, h))
-                if not writer.isOpened():
-                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                    writer = cv2.VideoWriter(str(self.session_folder / "thermal_view.mp4"), fourcc, self.config.frame_rate, (w, h))
-                self.video_writer = writer
-            if self.video_writer:
-                bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-                self.video_writer.write(bgr)
         self.truth_label.setText(label)
 
     def _on_audio_level(self, level: float):
         level_db = min(int(level * 1000), 100)
         self.audio_level.setValue(level_db)
 
+    def _on_worker_finished(self):
+        # a file replayed without looping ends the session by itself
+        if self.session_id is not None:
+            self._log_event("Источник кадров закончился")
+            self._stop_recording()
+
     def _on_error(self, message: str):
         QtWidgets.QMessageBox.critical(self, "Ошибка", message)
         self._stop_recording()
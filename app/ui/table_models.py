@@ -0,0 +1,181 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+from PySide6 import QtCore
+
+from app.utils.exporter import QARecord
+
+
+@dataclass(frozen=True)
+class Column:
+    key: str
+    title: str
+    editable: bool = False
+    # numeric columns are stored as numpy arrays, text columns as lists
+    dtype: Optional[type] = None
+
+
+class ColumnarTableModel(QtCore.QAbstractTableModel):
+    """Table model over one array per column instead of one item per cell.
+
+    ``reset`` replaces all rows in one model reset. Rows are exposed to the
+    view ``fetch_batch`` at a time through ``canFetchMore``/``fetchMore``,
+    so a view attached to a long table only lays out what it scrolls to.
+    Columns marked ``editable`` are edited in place.
+    """
+
+    columns: Sequence[Column] = ()
+    fetch_batch = 256
+
+    def __init__(self, parent: QtCore.QObject | None = None):
+        super().__init__(parent)
+        self._data: Dict[str, np.ndarray | list] = self._empty()
+        self._size = 0
+        self._loaded = 0
+
+    def _empty(self) -> Dict[str, np.ndarray | list]:
+        return {col.key: np.empty(0, dtype=col.dtype) if col.dtype else [] for col in self.columns}
+
+    def reset(self, data: Mapping[str, Sequence]):
+        sizes = {len(data[col.key]) for col in self.columns}
+        if len(sizes) > 1:
+            raise ValueError(f"Columns differ in length: {sizes}")
+        self.beginResetModel()
+        self._data = {
+            col.key: np.asarray(data[col.key], dtype=col.dtype) if col.dtype else list(data[col.key]) for col in self.columns
+        }
+        self._size = sizes.pop() if sizes else 0
+        self._loaded = min(self._size, self.fetch_batch)
+        self.endResetModel()
+
+    def clear(self):
+        self.reset(self._empty())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def column(self, key: str) -> np.ndarray | list:
+        return self._data[key]
+
+    def value(self, row: int, key: str):
+        value = self._data[key][row]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def append_row(self, values: Mapping[str, object]) -> int:
+        row = self._size
+        self.ensure_loaded(row - 1)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        for col in self.columns:
+            if col.dtype:
+                self._data[col.key] = np.append(self._data[col.key], np.asarray(values[col.key], dtype=col.dtype))
+            else:
+                self._data[col.key].append(values[col.key])
+        self._size += 1
+        self._loaded += 1
+        self.endInsertRows()
+        return row
+
+    def remove_rows(self, rows: Iterable[int]):
+        for row in sorted(set(rows), reverse=True):
+            if not 0 <= row < self._size:
+                continue
+            visible = row < self._loaded
+            if visible:
+                self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            for col in self.columns:
+                if col.dtype:
+                    self._data[col.key] = np.delete(self._data[col.key], row)
+                else:
+                    del self._data[col.key][row]
+            self._size -= 1
+            if visible:
+                self._loaded -= 1
+                self.endRemoveRows()
+
+    def ensure_loaded(self, row: int):
+        """Fetches rows until ``row`` is visible to the view."""
+        while row >= self._loaded and self.canFetchMore(QtCore.QModelIndex()):
+            self.fetchMore(QtCore.QModelIndex())
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index: QtCore.QModelIndex, role: int = QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return None
+        return self.value(index.row(), self.columns[index.column()].key)
+
+    def headerData(self, section: int, orientation: QtCore.Qt.Orientation, role: int = QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self.columns[section].title
+        return section + 1
+
+    def flags(self, index: QtCore.QModelIndex) -> QtCore.Qt.ItemFlags:
+        flags = super().flags(index)
+        if index.isValid() and self.columns[index.column()].editable:
+            flags |= QtCore.Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index: QtCore.QModelIndex, value, role: int = QtCore.Qt.EditRole) -> bool:
+        if not index.isValid() or role != QtCore.Qt.EditRole or not self.columns[index.column()].editable:
+            return False
+        col = self.columns[index.column()]
+        self._data[col.key][index.row()] = value
+        self.dataChanged.emit(index, index, [QtCore.Qt.DisplayRole, QtCore.Qt.EditRole])
+        return True
+
+    def canFetchMore(self, parent: QtCore.QModelIndex) -> bool:
+        return not parent.isValid() and self._loaded < self._size
+
+    def fetchMore(self, parent: QtCore.QModelIndex):
+        count = min(self.fetch_batch, self._size - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+
+class QuestionListModel(ColumnarTableModel):
+    """Questionnaire of a session; the text is edited in place."""
+
+    columns = (Column("text", "Вопрос", editable=True),)
+
+    def set_questions(self, questions: Sequence[str]):
+        self.reset({"text": questions})
+
+    def add_question(self, text: str = "") -> int:
+        return self.append_row({"text": text})
+
+    def questions(self) -> List[str]:
+        """Non-empty questions in table order."""
+        return [text.strip() for text in self.column("text") if text and text.strip()]
+
+
+class QARecordModel(ColumnarTableModel):
+    """QA rows of a reviewed session; question and answer text are editable."""
+
+    columns = (
+        Column("number", "#", dtype=np.int64),
+        Column("question", "Вопрос", editable=True),
+        Column("answer_text", "Ответ (ASR)", editable=True),
+        Column("verdict", "Итог"),
+        Column("start_ms", "Начало", dtype=np.int64),
+        Column("end_ms", "Конец", dtype=np.int64),
+    )
+
+    def set_records(self, records: Sequence[QARecord]):
+        self.reset({col.key: [getattr(rec, col.key) for rec in records] for col in self.columns})
+
+    def record(self, row: int) -> QARecord:
+        return QARecord(**{col.key: self.value(row, col.key) for col in self.columns})
+
+    def records(self) -> List[QARecord]:
+        return [self.record(row) for row in range(len(self))]
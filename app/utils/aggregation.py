@@ -0,0 +1,130 @@
+from __future__ import annotations
+from typing import List, Sequence
+
+import numpy as np
+
+from app.utils.exporter import QARecord
+from app.utils.timeline import LABEL_CODES, LABELS, SegmentEntry, Timeline
+
+NO_VERDICT = "—"
+# start/end of a question that was never reached
+NOT_REACHED = -1
+LIE = LABEL_CODES["Ложь"]
+
+SEGMENT_STATS_DTYPE = np.dtype(
+    [
+        ("start_ms", "<i8"),
+        ("end_ms", "<i8"),
+        ("frames", "<i8"),
+        ("mean", "<f8"),
+        ("max", "<f4"),
+        ("lie_fraction", "<f8"),
+        ("above_hi_ms", "<i8"),
+    ]
+)
+
+
+class ScoreIndex:
+    """Sorted per-frame scores with prefix sums for O(log n) segment statistics.
+
+    A segment ``[start_ms, end_ms]`` covers the frames captured inside it;
+    their bounds come from ``searchsorted`` on the timestamps and sums from
+    differences of prefix sums, so any number of segments is aggregated in
+    one vectorised pass. A frame is taken to last until the next one, which
+    is what "time above threshold" is measured in.
+    """
+
+    def __init__(self, timestamps: np.ndarray, scores: np.ndarray, label_codes: np.ndarray):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        order = None if np.all(timestamps[1:] >= timestamps[:-1]) else np.argsort(timestamps, kind="stable")
+        pick = (lambda a: np.asarray(a)[order]) if order is not None else np.asarray
+        self.timestamps = pick(timestamps)
+        self.scores = pick(scores).astype(np.float32, copy=False)
+        self.label_codes = pick(label_codes)
+        self.hold = np.diff(self.timestamps, append=self.timestamps[-1:]) if len(self.timestamps) else np.empty(0, dtype=np.int64)
+        self._cum_scores = _prefix(self.scores.astype(np.float64))
+        self._cum_lie = _prefix(self.label_codes == LIE)
+        # scores padded with -inf so ``maximum.reduceat`` can take end indices equal to len()
+        self._padded = np.append(self.scores, np.float32(-np.inf))
+
+    @classmethod
+    def from_timeline(cls, timeline: Timeline) -> "ScoreIndex":
+        return cls(timeline.timestamps, timeline.scores, timeline.label_codes)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def bounds(self, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Frame index ranges ``lo[i]:hi[i]`` of the segments."""
+        lo = np.searchsorted(self.timestamps, starts, side="left")
+        hi = np.maximum(np.searchsorted(self.timestamps, ends, side="right"), lo)
+        return lo, hi
+
+    def aggregate(self, starts: Sequence[int], ends: Sequence[int], threshold_hi: float) -> np.ndarray:
+        """SEGMENT_STATS_DTYPE row per segment; statistics of empty segments are NaN/0."""
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        lo, hi = self.bounds(starts, ends)
+        frames = hi - lo
+        out = np.zeros(len(starts), dtype=SEGMENT_STATS_DTYPE)
+        out["start_ms"] = starts
+        out["end_ms"] = ends
+        out["frames"] = frames
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["mean"] = (self._cum_scores[hi] - self._cum_scores[lo]) / frames
+            out["lie_fraction"] = (self._cum_lie[hi] - self._cum_lie[lo]) / frames
+        if len(starts):
+            # even slots reduce lo[i]:hi[i]; odd slots are the gaps between segments and are dropped
+            peaks = np.maximum.reduceat(self._padded, np.column_stack((lo, hi)).ravel())[::2]
+            out["max"] = np.where(frames > 0, peaks, np.nan)
+        above = np.where(self.scores > threshold_hi, self.hold, 0)
+        cum_above = _prefix(above)
+        above_ms = cum_above[hi] - cum_above[lo]
+        # the last frame of a segment only counts up to the segment end
+        has = frames > 0
+        last = hi[has] - 1
+        overrun = np.maximum(self.timestamps[last] + self.hold[last] - ends[has], 0)
+        above_ms[has] -= np.where(self.scores[last] > threshold_hi, np.minimum(overrun, self.hold[last]), 0)
+        out["above_hi_ms"] = above_ms
+        return out
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(values) + 1, dtype=np.float64 if values.dtype.kind == "f" else np.int64)
+    np.cumsum(values, out=out[1:])
+    return out
+
+
+def segment_verdicts(stats: np.ndarray, lie_fraction: float = 0.5) -> List[str]:
+    """"Ложь" where at least ``lie_fraction`` of a segment's frames were labelled so."""
+    codes = np.where(stats["lie_fraction"] >= lie_fraction, LIE, 1 - LIE)
+    return [LABELS[code] if frames else NO_VERDICT for code, frames in zip(codes.tolist(), stats["frames"].tolist())]
+
+
+def build_qa_records(
+    questions: Sequence[str],
+    segments: Sequence[SegmentEntry],
+    timeline: Timeline,
+    threshold_hi: float,
+    answer_text: str = "",
+) -> List[QARecord]:
+    """QA rows for ``questions``, the n-th one spanning the n-th "qa" segment.
+
+    Questions that were never reached get NOT_REACHED as span and no verdict.
+    """
+    qa = [seg for seg in segments if seg.type == "qa"]
+    spans = np.array(
+        [(seg.start_ms, seg.end_ms if seg.end_ms is not None else seg.start_ms) for seg in qa[: len(questions)]],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    index = ScoreIndex.from_timeline(timeline)
+    stats = index.aggregate(spans[:, 0], spans[:, 1], threshold_hi)
+    verdicts = segment_verdicts(stats)
+    records = []
+    for i, question in enumerate(questions):
+        if i < len(stats):
+            start, end, verdict = int(stats["start_ms"][i]), int(stats["end_ms"][i]), verdicts[i]
+        else:
+            start, end, verdict = NOT_REACHED, NOT_REACHED, NO_VERDICT
+        records.append(QARecord(i + 1, question, answer_text, verdict, start, end))
+    return records
@@ -0,0 +1,60 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+
+@dataclass
+class Envelope:
+    """Decimated series: bin ``i`` starts at ``timestamps[i]`` and spans ``mins[i]..maxs[i]``."""
+
+    timestamps: np.ndarray
+    mins: np.ndarray
+    maxs: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+class MinMaxPyramid:
+    """Min/max envelopes of a time series at every power-of-two bin size.
+
+    Level 0 is the series itself; level ``k`` has one bin per ``2**k``
+    samples holding their minimum and maximum and the timestamp of the first
+    one, so spikes survive any zoom level. Building is O(n) and the levels
+    together take about as much memory as the series. ``envelope`` picks
+    the finest level that fits the requested number of points, so the cost
+    of a redraw depends on the widget width, not on the session length.
+    """
+
+    def __init__(self, timestamps: np.ndarray, values: np.ndarray):
+        ts = np.asarray(timestamps, dtype=np.int64)
+        vals = np.asarray(values, dtype=np.float32)
+        self.levels: List[Envelope] = [Envelope(ts, vals, vals)]
+        while len(ts) > 1:
+            if len(ts) % 2:
+                # pair the odd last bin with itself
+                ts = np.append(ts, ts[-1])
+                lo = np.append(self.levels[-1].mins, self.levels[-1].mins[-1])
+                hi = np.append(self.levels[-1].maxs, self.levels[-1].maxs[-1])
+            else:
+                lo, hi = self.levels[-1].mins, self.levels[-1].maxs
+            ts = ts[::2]
+            self.levels.append(Envelope(ts, np.minimum(lo[::2], lo[1::2]), np.maximum(hi[::2], hi[1::2])))
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def envelope(self, start_ms: int, end_ms: int, max_points: int) -> Envelope:
+        """Bins covering ``start_ms..end_ms``, at most about ``max_points`` of them.
+
+        One bin on each side of the range is included so a line drawn from
+        the result reaches the edges.
+        """
+        for level in self.levels:
+            lo = max(int(np.searchsorted(level.timestamps, start_ms, side="right")) - 1, 0)
+            hi = min(int(np.searchsorted(level.timestamps, end_ms, side="left")) + 1, len(level))
+            if hi - lo <= max_points:
+                break
+        return Envelope(level.timestamps[lo:hi], level.mins[lo:hi], level.maxs[lo:hi])
@@ -1,8 +1,22 @@
 from __future__ import annotations
+import csv
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
 from openpyxl import Workbook
-from dataclasses import dataclass
-from typing import List
+
+from app.utils.timeline import LABELS, SegmentEntry, Timeline
+
+# rows converted and written per step; bounds memory independently of the session length
+BLOCK_ROWS = 65536
+# Excel's sheet limit, minus the header
+XLSX_MAX_ROWS = 1_048_575
+
+Progress = Callable[[int, int], None]
 
 
 @dataclass
@@ -15,11 +29,288 @@ class QARecord:
     end_ms: int
 
 
+@dataclass(frozen=True)
+class TableSpec:
+    """Layout of an exported table; blocks written to it are dicts keyed by ``columns``.
+
+    ``types`` are "int64", "float32", "bool", "string" or "label" (uint8
+    codes into LABELS); they fix the Parquet schema however sparse a block is.
+    """
+
+    name: str
+    title: str
+    columns: Tuple[str, ...]
+    headers: Tuple[str, ...]
+    types: Tuple[str, ...]
+
+
+QA_TABLE = TableSpec(
+    "qa",
+    "QA",
+    ("number", "question", "answer_text", "verdict", "start_ms", "end_ms"),
+    ("#", "Вопрос", "Ответ (ASR)", "Итог", "Начало, мс", "Конец, мс"),
+    ("int64", "string", "string", "string", "int64", "int64"),
+)
+TIMELINE_TABLE = TableSpec(
+    "timeline",
+    "Timeline",
+    ("timestamp_ms", "label", "score", "computed"),
+    ("timestamp_ms", "label", "score", "computed"),
+    ("int64", "label", "float32", "bool"),
+)
+SEGMENTS_TABLE = TableSpec(
+    "segments",
+    "Segments",
+    ("type", "start_ms", "end_ms", "label", "question_text", "notes"),
+    ("type", "start_ms", "end_ms", "label", "question_text", "notes"),
+    ("string", "int64", "int64", "string", "string", "string"),
+)
+
+Block = Dict[str, Sequence]
+
+
+def block_rows(block: Block) -> int:
+    return len(next(iter(block.values()))) if block else 0
+
+
+def qa_blocks(records: Sequence[QARecord]) -> Iterator[Block]:
+    yield {key: [getattr(rec, key) for rec in records] for key in QA_TABLE.columns}
+
+
+def timeline_blocks(timeline: Timeline) -> Iterator[Block]:
+    for start in range(0, len(timeline), BLOCK_ROWS):
+        stop = start + BLOCK_ROWS
+        yield {
+            "timestamp_ms": timeline.timestamps[start:stop],
+            # labels stay uint8 codes into LABELS until a writer needs text
+            "label": timeline.label_codes[start:stop],
+            "score": timeline.scores[start:stop],
+            "computed": timeline.computed[start:stop],
+        }
+
+
+def segment_blocks(segments: Sequence[SegmentEntry]) -> Iterator[Block]:
+    yield {key: [getattr(seg, key) for seg in segments] for key in SEGMENTS_TABLE.columns}
+
+
+def _python_columns(spec: TableSpec, block: Block) -> List[list]:
+    """Block columns as Python lists, label codes turned back into text."""
+    columns = []
+    for key, kind in zip(spec.columns, spec.types):
+        values = block[key]
+        if kind == "label":
+            values = np.asarray(LABELS, dtype=object)[np.asarray(values)]
+        elif kind == "float32":
+            values = np.asarray(values, dtype=np.float64).round(6)
+            # empty cells rather than "nan", which Excel rejects
+            values = np.where(np.isnan(values), None, values.astype(object))
+        columns.append(values.tolist() if isinstance(values, np.ndarray) else list(values))
+    return columns
+
+
+class TableSink(ABC):
+    """Incremental writer of several tables; blocks of different tables may interleave.
+
+    Files are written under a ".tmp" name and renamed by ``close``; ``abort``
+    deletes them instead, so a failed export leaves neither unreadable
+    files nor a damaged earlier export behind.
+    """
+
+    def __init__(self):
+        self._paths: List[Path] = []
+
+    def _target(self, path: Path) -> Path:
+        self._paths.append(path)
+        return _temp_path(path)
+
+    @abstractmethod
+    def begin(self, spec: TableSpec):
+        """Starts ``spec``'s table; its blocks may be written from then on."""
+
+    @abstractmethod
+    def write(self, spec: TableSpec, block: Block):
+        """Appends ``block`` to ``spec``'s table."""
+
+    @abstractmethod
+    def _release(self, keep: bool):
+        """Finishes (``keep``) or just closes the temporary files."""
+
+    def close(self) -> List[Path]:
+        self._release(keep=True)
+        for path in self._paths:
+            os.replace(_temp_path(path), path)
+        return list(self._paths)
+
+    def abort(self):
+        try:
+            self._release(keep=False)
+        finally:
+            for path in self._paths:
+                _temp_path(path).unlink(missing_ok=True)
+
+
+def _temp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+class XlsxSink(TableSink):
+    """One sheet per table in a write-only workbook; rows are streamed to temp files as they are added.
+
+    A table longer than an Excel sheet continues on "<title> (2)" and so on.
+    """
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self._temp = self._target(path)
+        self._wb = Workbook(write_only=True)
+        # table name -> [sheet, part, rows used]
+        self._sheets: Dict[str, list] = {}
+
+    def _add_sheet(self, spec: TableSpec, part: int):
+        ws = self._wb.create_sheet(spec.title if part == 1 else f"{spec.title} ({part})")
+        ws.append(list(spec.headers))
+        self._sheets[spec.name] = [ws, part, 0]
+
+    def begin(self, spec: TableSpec):
+        self._add_sheet(spec, 1)
+
+    def write(self, spec: TableSpec, block: Block):
+        state = self._sheets[spec.name]
+        for row in zip(*_python_columns(spec, block)):
+            if state[2] == XLSX_MAX_ROWS:
+                self._add_sheet(spec, state[1] + 1)
+                state = self._sheets[spec.name]
+            state[0].append(row)
+            state[2] += 1
+
+    def _release(self, keep: bool):
+        # saving is also what finishes the sheets and removes openpyxl's own temp files
+        self._wb.save(self._temp)
+
+
+class CsvSink(TableSink):
+    """``<prefix><name>.csv`` per table, UTF-8 with BOM so Excel detects the encoding."""
+
+    def __init__(self, folder: Path, prefix: str = ""):
+        super().__init__()
+        self.folder = folder
+        self.prefix = prefix
+        self._files: Dict[str, tuple] = {}
+
+    def begin(self, spec: TableSpec):
+        fh = open(self._target(self.folder / f"{self.prefix}{spec.name}.csv"), "w", newline="", encoding="utf-8-sig")
+        writer = csv.writer(fh)
+        writer.writerow(spec.headers)
+        self._files[spec.name] = (fh, writer)
+
+    def write(self, spec: TableSpec, block: Block):
+        self._files[spec.name][1].writerows(zip(*_python_columns(spec, block)))
+
+    def _release(self, keep: bool):
+        for fh, _ in self._files.values():
+            fh.close()
+
+
+class ParquetSink(TableSink):
+    """``<prefix><name>.parquet`` per table, one row group per block; numeric columns are passed without copies."""
+
+    def __init__(self, folder: Path, prefix: str = ""):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("pyarrow is not installed: pip install pyarrow") from None
+        super().__init__()
+        self._pa = pa
+        self._pq = pq
+        self.folder = folder
+        self.prefix = prefix
+        self._labels = pa.array(LABELS, type=pa.string())
+        self._types = {
+            "int64": pa.int64(),
+            "float32": pa.float32(),
+            "bool": pa.bool_(),
+            "string": pa.string(),
+            "label": pa.dictionary(pa.uint8(), pa.string()),
+        }
+        self._writers: Dict[str, tuple] = {}
+
+    def begin(self, spec: TableSpec):
+        pa = self._pa
+        schema = pa.schema([(key, self._types[kind]) for key, kind in zip(spec.columns, spec.types)])
+        path = self._target(self.folder / f"{self.prefix}{spec.name}.parquet")
+        self._writers[spec.name] = self._pq.ParquetWriter(path, schema)
+
+    def write(self, spec: TableSpec, block: Block):
+        pa = self._pa
+        arrays = []
+        for key, kind in zip(spec.columns, spec.types):
+            if kind == "label":
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(block[key], type=pa.uint8()), self._labels))
+            else:
+                arrays.append(pa.array(block[key], type=self._types[kind]))
+        writer = self._writers[spec.name]
+        writer.write_batch(pa.record_batch(arrays, schema=writer.schema))
+
+    def _release(self, keep: bool):
+        for writer in self._writers.values():
+            writer.close()
+
+
+def open_sink(fmt: str, target: Path, prefix: str = "") -> TableSink:
+    """Sink for ``fmt``; ``target`` is the workbook path for "xlsx" and the output folder otherwise."""
+    if fmt == "xlsx":
+        return XlsxSink(target)
+    if fmt == "csv":
+        return CsvSink(target, prefix)
+    if fmt == "parquet":
+        return ParquetSink(target, prefix)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+EXPORT_FORMATS = {"xlsx": "Excel", "csv": "CSV", "parquet": "Parquet"}
+
+
+def export_session(
+    folder: Path,
+    fmt: str,
+    records: Sequence[QARecord],
+    timeline: Timeline | None = None,
+    segments: Sequence[SegmentEntry] = (),
+    progress: Optional[Progress] = None,
+) -> List[Path]:
+    """Writes QA rows, the per-frame timeline and segments of a session into ``folder``.
+
+    ``xlsx`` produces ``qa.xlsx`` with a sheet per table, ``csv`` and
+    ``parquet`` one file per table. Returns the written paths.
+    """
+    tables = [(QA_TABLE, len(records), qa_blocks(records))]
+    if timeline is not None:
+        tables.append((TIMELINE_TABLE, len(timeline), timeline_blocks(timeline)))
+    tables.append((SEGMENTS_TABLE, len(segments), segment_blocks(segments)))
+    total = sum(rows for _, rows, _ in tables)
+    done = 0
+    sink = open_sink(fmt, folder / "qa.xlsx" if fmt == "xlsx" else folder)
+    try:
+        for spec, _, blocks in tables:
+            sink.begin(spec)
+            for block in blocks:
+                sink.write(spec, block)
+                done += block_rows(block)
+                if progress is not None:
+                    progress(done, total)
+        return sink.close()
+    except BaseException:
+        sink.abort()
+        raise
+
+
 def export_qa(records: List[QARecord], path: Path):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "QA"
-    ws.append(["#", "Вопрос", "Ответ (ASR)", "Итог", "Начало, мс", "Конец, мс"])
-    for rec in records:
-        ws.append([rec.number, rec.question, rec.answer_text, rec.verdict, rec.start_ms, rec.end_ms])
-    wb.save(path)
+    sink = XlsxSink(path)
+    try:
+        sink.begin(QA_TABLE)
+        sink.write(QA_TABLE, next(qa_blocks(records)))
+        sink.close()
+    except BaseException:
+        sink.abort()
+        raise
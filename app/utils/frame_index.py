@@ -0,0 +1,64 @@
+from __future__ import annotations
+import logging
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.utils.timeline import Timeline
+
+VIDEO_INDEX_FILE = "thermal_view.index.npy"
+
+
+class FrameIndex:
+    """Capture timestamp of every frame of ``thermal_view.mp4``, in recording order.
+
+    Recorded sessions get the encoder's list of written frames, so frame
+    ``i`` was captured at ``timestamps[i]`` on the session clock (the one
+    segments and QA rows use) even when frames were dropped before
+    encoding. Sessions recorded without a sidecar fall back to one video
+    frame per timeline entry. Mapping a time to a frame is a binary search
+    and needs no decoding. The sidecar is a plain .npy file, memory-mapped on
+    load, and stays valid when the timeline is re-scored.
+    """
+
+    def __init__(self, timestamps: Sequence[int] | np.ndarray):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def start_ms(self) -> int:
+        return int(self.timestamps[0]) if len(self.timestamps) else 0
+
+    @property
+    def end_ms(self) -> int:
+        return int(self.timestamps[-1]) if len(self.timestamps) else 0
+
+    def frame_at(self, ts_ms: int) -> int:
+        """Index of the frame on screen at ``ts_ms``: the last one captured at or before it."""
+        i = int(np.searchsorted(self.timestamps, ts_ms, side="right")) - 1
+        return min(max(i, 0), len(self.timestamps) - 1)
+
+    def save(self, path: Path):
+        np.save(path, self.timestamps)
+
+    @classmethod
+    def load(cls, path: Path) -> "FrameIndex":
+        return cls(np.load(path, mmap_mode="r"))
+
+    @classmethod
+    def for_session(cls, folder: Path, timeline: Timeline | None = None) -> Optional["FrameIndex"]:
+        """The session's sidecar, built from ``timeline`` (and saved) for sessions recorded without one."""
+        path = folder / VIDEO_INDEX_FILE
+        if path.exists():
+            return cls.load(path)
+        if timeline is None or not len(timeline):
+            return None
+        index = cls(timeline.timestamps.copy())
+        try:
+            index.save(path)
+        except OSError:
+            logging.warning("Cannot write frame index %s", path)
+        return index
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import json
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, List
+
+import numpy as np
+
+from app.utils.timeline import LABEL_CODES, SegmentEntry, Timeline
+
+TIMELINE_JOURNAL = "timeline.journal"
+SEGMENTS_JOURNAL = "segments.jsonl"
+
+JOURNAL_MAGIC = b"TDJ"
+JOURNAL_VERSION = 2
+HEADER = struct.Struct("<3sB")
+RECORD = struct.Struct("<qfBB")
+RECORD_DTYPES = {
+    1: np.dtype([("timestamp_ms", "<i8"), ("score", "<f4"), ("label", "u1")]),
+    2: np.dtype([("timestamp_ms", "<i8"), ("score", "<f4"), ("label", "u1"), ("computed", "u1")]),
+}
+
+
+class SessionJournal:
+    """Append-only crash journal written while a session is recording.
+
+    Per-frame results go to ``timeline.journal`` as fixed-size binary records,
+    buffered in memory and flushed with fsync every ``flush_records`` records
+    or ``flush_interval`` seconds. Segment open/close events go to
+    ``segments.jsonl`` and are synced immediately; they are rare.
+    """
+
+    def __init__(self, folder: Path, flush_records: int = 256, flush_interval: float = 1.0):
+        self.folder = folder
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._timeline: BinaryIO = open(folder / TIMELINE_JOURNAL, "wb")
+        self._timeline.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION))
+        self._segments = open(folder / SEGMENTS_JOURNAL, "w", encoding="utf-8")
+        self._sync(self._timeline)
+
+    def append(self, timestamp_ms: int, label: str, score: float, computed: bool = True):
+        with self._lock:
+            self._buffer += RECORD.pack(timestamp_ms, score, LABEL_CODES[label], int(computed))
+            self._buffered += 1
+            if self._buffered >= self.flush_records or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def open_segment(self, segment_id: int, entry: SegmentEntry, question_id: int | None = None):
+        self._write_segment(
+            {
+                "op": "open",
+                "id": segment_id,
+                "type": entry.type,
+                "start_ms": entry.start_ms,
+                "end_ms": entry.end_ms,
+                "label": entry.label,
+                "question_text": entry.question_text,
+                "question_id": question_id,
+            }
+        )
+
+    def close_segment(self, segment_id: int, end_ms: int):
+        self._write_segment({"op": "close", "id": segment_id, "end_ms": end_ms})
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self, remove: bool = False):
+        self.flush()
+        self._timeline.close()
+        self._segments.close()
+        if remove:
+            for name in (TIMELINE_JOURNAL, SEGMENTS_JOURNAL):
+                (self.folder / name).unlink(missing_ok=True)
+
+    def _flush_locked(self):
+        if self._buffer:
+            self._timeline.write(self._buffer)
+            self._buffer.clear()
+            self._buffered = 0
+            self._sync(self._timeline)
+        self._last_flush = time.monotonic()
+
+    def _write_segment(self, record: dict):
+        self._segments.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._sync(self._segments)
+
+    @staticmethod
+    def _sync(fh):
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+@dataclass
+class JournalSegment:
+    id: int
+    question_id: int | None
+    entry: SegmentEntry
+
+
+def read_timeline_journal(path: Path) -> Timeline:
+    raw = path.read_bytes()
+    if len(raw) < HEADER.size:
+        return Timeline()
+    magic, version = HEADER.unpack_from(raw)
+    if magic != JOURNAL_MAGIC or version not in RECORD_DTYPES:
+        raise RuntimeError(f"Unsupported journal format: {path}")
+    dtype = RECORD_DTYPES[version]
+    body = raw[HEADER.size :]
+    # a crash can leave a partially written last record
+    usable = len(body) - len(body) % dtype.itemsize
+    records = np.frombuffer(body[:usable], dtype=dtype)
+    computed = records["computed"].astype(bool) if "computed" in dtype.names else None
+    return Timeline.from_arrays(records["timestamp_ms"], records["score"], records["label"], computed)
+
+
+def read_segment_journal(path: Path, end_ms: int | None = None) -> List[JournalSegment]:
+    """Replays open/close events; segments left open are closed at ``end_ms``."""
+    segments: dict[int, JournalSegment] = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break  # torn last line
+            if record["op"] == "open":
+                entry = SegmentEntry(
+                    type=record["type"],
+                    start_ms=record["start_ms"],
+                    end_ms=record["end_ms"],
+                    label=record["label"],
+                    question_text=record["question_text"],
+                )
+                segments[record["id"]] = JournalSegment(record["id"], record["question_id"], entry)
+            elif record["op"] == "close" and record["id"] in segments:
+                segments[record["id"]].entry.end_ms = record["end_ms"]
+    result = list(segments.values())
+    for seg in result:
+        if seg.entry.end_ms is None and end_ms is not None:
+            seg.entry.end_ms = max(end_ms, seg.entry.start_ms)
+    return result
@@ -0,0 +1,19 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import List
+
+from openpyxl import load_workbook
+
+
+def load_questions(path: Path) -> List[str]:
+    """Questions from a text file (one per line) or the first column of an .xlsx sheet."""
+    if path.suffix.lower() == ".xlsx":
+        wb = load_workbook(path, read_only=True)
+        try:
+            cells = [row[0] for row in wb.active.iter_rows(max_col=1, values_only=True)]
+        finally:
+            wb.close()
+        lines = [str(cell) for cell in cells if cell is not None]
+    else:
+        lines = path.read_text(encoding="utf-8-sig").splitlines()
+    return [line.strip() for line in lines if line.strip()]
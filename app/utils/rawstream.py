@@ -0,0 +1,229 @@
+from __future__ import annotations
+import json
+import os
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+RAW_DIR = "thermal_raw"
+RAW_VERSION = 1
+META_FILE = "meta.json"
+INDEX_FILE = "index.bin"
+COMPRESSIONS = ("none", "zlib")
+INDEX_DTYPE = np.dtype([("ts_ms", "<i8"), ("chunk", "<u4"), ("offset", "<u8")])
+
+
+def chunk_path(folder: Path, chunk: int, compressed: bool = False) -> Path:
+    return folder / f"chunk_{chunk:05d}.raw{'.z' if compressed else ''}"
+
+
+class RawStreamWriter:
+    """Appends single-channel frames to fixed-size chunk files.
+
+    Every chunk holds ``chunk_frames`` frames back to back and is written
+    through a memory map, so an uncompressed chunk can be mapped again for
+    reading as is. ``index.bin`` gets one ``INDEX_DTYPE`` record per frame
+    (timestamp, chunk, byte offset inside the uncompressed chunk). With
+    ``zlib`` compression a chunk is compressed on a background thread once
+    it is full and replaces the raw file by an atomic rename; multi-byte
+    samples are byte-shuffled first (all low bytes, then all high bytes),
+    which compresses noticeably better and faster for sensor data. A
+    compressed chunk is inflated whole on read, so ``chunk_frames`` bounds
+    the cost of a random seek. All frames must have the shape and dtype of
+    the first one.
+    """
+
+    def __init__(self, folder: Path, chunk_frames: int = 64, compression: str = "none", level: int = 1):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown raw compression: {compression}")
+        self.folder = folder
+        self.chunk_frames = chunk_frames
+        self.compression = compression
+        self.level = level
+        self.frames = 0
+        self.bytes_written = 0
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._dtype: Optional[np.dtype] = None
+        self._chunk: Optional[np.memmap] = None
+        folder.mkdir(parents=True, exist_ok=True)
+        self._index = open(folder / INDEX_FILE, "wb")
+        self._compressor = ThreadPoolExecutor(max_workers=1) if compression != "none" else None
+        self._pending: List[Future] = []
+
+    def append(self, matrix: np.ndarray, ts_ms: int):
+        if self._shape is None:
+            self._start(matrix)
+        elif matrix.shape != self._shape or matrix.dtype != self._dtype:
+            raise RuntimeError(f"Raw stream frame {matrix.shape} {matrix.dtype} differs from {self._shape} {self._dtype}")
+        chunk, slot = divmod(self.frames, self.chunk_frames)
+        if slot == 0:
+            self._open_chunk(chunk)
+        self._chunk[slot] = matrix
+        record = np.array([(ts_ms, chunk, slot * self._frame_bytes)], dtype=INDEX_DTYPE)
+        self._index.write(record.tobytes())
+        self.frames += 1
+        if slot == self.chunk_frames - 1:
+            self._finish_chunk(chunk, self.chunk_frames)
+
+    def close(self):
+        if self._chunk is not None:
+            used = self.frames - (self.frames - 1) // self.chunk_frames * self.chunk_frames
+            self._finish_chunk((self.frames - 1) // self.chunk_frames, used)
+        self._index.close()
+        if self._compressor is not None:
+            for future in self._pending:
+                future.result()
+            self._compressor.shutdown()
+
+    def stats(self) -> dict:
+        return {"frames": self.frames, "bytes": self.bytes_written, "compression": self.compression}
+
+    def _start(self, matrix: np.ndarray):
+        self._shape = matrix.shape
+        self._dtype = matrix.dtype
+        self._frame_bytes = matrix.nbytes
+        meta = {
+            "version": RAW_VERSION,
+            "shape": list(matrix.shape),
+            "dtype": matrix.dtype.str,
+            "chunk_frames": self.chunk_frames,
+            "compression": self.compression,
+        }
+        (self.folder / META_FILE).write_text(json.dumps(meta, indent=2))
+
+    def _open_chunk(self, chunk: int):
+        self._chunk = np.memmap(chunk_path(self.folder, chunk), dtype=self._dtype, mode="w+", shape=(self.chunk_frames,) + self._shape)
+
+    def _finish_chunk(self, chunk: int, used: int):
+        mm, self._chunk = self._chunk, None
+        mm.flush()
+        self._index.flush()
+        if self._compressor is None:
+            # drop the unused tail of a partial last chunk
+            del mm
+            os.truncate(chunk_path(self.folder, chunk), used * self._frame_bytes)
+            self.bytes_written += used * self._frame_bytes
+            return
+        for future in self._pending:
+            if future.done():
+                future.result()  # surface compression errors on the writing thread
+        self._pending = [future for future in self._pending if not future.done()]
+        # compress a copy and unmap now: Windows cannot delete a file that is still mapped
+        frames = np.array(mm[:used])
+        del mm
+        self._pending.append(self._compressor.submit(self._compress, chunk, frames))
+
+    def _compress(self, chunk: int, frames: np.ndarray):
+        data = zlib.compress(_shuffle(frames), self.level)
+        del frames
+        target = chunk_path(self.folder, chunk, compressed=True)
+        tmp = target.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+        chunk_path(self.folder, chunk).unlink()
+        self.bytes_written += len(data)
+
+
+class RawStreamReader:
+    """Random access to a stream written by ``RawStreamWriter``.
+
+    Uncompressed chunks are memory-mapped, so ``frame(i)`` is a view into
+    the page cache; compressed chunks are inflated whole, the last
+    ``cache_chunks`` are kept, and frames from them are returned as copies
+    so a caller holding one frame does not pin a whole inflated chunk. A
+    torn last index record, left by a crash, is ignored.
+    """
+
+    def __init__(self, folder: Path, cache_chunks: int = 2):
+        self.folder = folder
+        meta = json.loads((folder / META_FILE).read_text())
+        if meta["version"] != RAW_VERSION:
+            raise RuntimeError(f"Unsupported raw stream version: {folder}")
+        self.shape = tuple(meta["shape"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.chunk_frames = meta["chunk_frames"]
+        raw = (folder / INDEX_FILE).read_bytes()
+        usable = len(raw) - len(raw) % INDEX_DTYPE.itemsize
+        self.index = np.frombuffer(raw[:usable], dtype=INDEX_DTYPE)
+        self.cache_chunks = cache_chunks
+        self._chunks: OrderedDict[int, np.ndarray] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.index["ts_ms"]
+
+    def frame(self, i: int) -> np.ndarray:
+        record = self.index[i]
+        chunk = self._chunk(int(record["chunk"]))
+        return _detach(chunk[int(record["offset"]) // self._frame_bytes])
+
+    def frame_at(self, ts_ms: int) -> np.ndarray:
+        """The last frame recorded at or before ``ts_ms``."""
+        i = int(np.searchsorted(self.timestamps, ts_ms, side="right")) - 1
+        return self.frame(max(i, 0))
+
+    def frames(self, start: int, stop: int) -> np.ndarray:
+        """Frames ``start..stop-1`` as one (N,H,W) array; a view when they share a chunk."""
+        stop = min(stop, len(self))
+        parts = []
+        i = start
+        while i < stop:
+            record = self.index[i]
+            chunk = self._chunk(int(record["chunk"]))
+            slot = int(record["offset"]) // self._frame_bytes
+            take = min(stop - i, len(chunk) - slot)
+            parts.append(chunk[slot : slot + take])
+            i += take
+        if len(parts) == 1:
+            return _detach(parts[0])
+        return np.concatenate(parts) if parts else np.empty((0,) + self.shape, dtype=self.dtype)
+
+    @property
+    def _frame_bytes(self) -> int:
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def _chunk(self, chunk: int) -> np.ndarray:
+        cached = self._chunks.get(chunk)
+        if cached is not None:
+            self._chunks.move_to_end(chunk)
+            return cached
+        compressed = chunk_path(self.folder, chunk, compressed=True)
+        if compressed.exists():
+            data = _unshuffle(zlib.decompress(compressed.read_bytes()), self.dtype)
+        else:
+            # not compressed yet, or written uncompressed
+            data = np.memmap(chunk_path(self.folder, chunk), dtype=self.dtype, mode="r")
+        frames = data[: len(data) // int(np.prod(self.shape)) * int(np.prod(self.shape))].reshape((-1,) + self.shape)
+        self._chunks[chunk] = frames
+        if len(self._chunks) > self.cache_chunks:
+            self._chunks.popitem(last=False)
+        return frames
+
+
+def _shuffle(frames: np.ndarray) -> bytes:
+    if frames.dtype.itemsize == 1:
+        return memoryview(frames).cast("B")
+    return frames.view(np.uint8).reshape(-1, frames.dtype.itemsize).T.tobytes()
+
+
+def _unshuffle(data: bytes, dtype: np.dtype) -> np.ndarray:
+    planes = np.frombuffer(data, dtype=np.uint8)
+    if dtype.itemsize == 1:
+        return planes.view(dtype)
+    return planes.reshape(dtype.itemsize, -1).T.copy().view(dtype).reshape(-1)
+
+
+def _detach(frames: np.ndarray) -> np.ndarray:
+    return frames if isinstance(frames, np.memmap) else frames.copy()
+
+
+def open_raw_stream(folder: Path) -> Optional[RawStreamReader]:
+    raw = folder / RAW_DIR
+    return RawStreamReader(raw) if (raw / META_FILE).exists() else None
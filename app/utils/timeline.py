@@ -2,7 +2,12 @@ from __future__ import annotations
 import json
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Sequence
+
+import numpy as np
+
+LABELS = ("Правда", "Ложь")
+LABEL_CODES = {label: code for code, label in enumerate(LABELS)}
 
 
 @dataclass
@@ -10,6 +15,7 @@ class TimelineEntry:
     timestamp_ms: int
     label: str
     score: float
+    computed: bool = True
 
 
 @dataclass
@@ -22,11 +28,145 @@ class SegmentEntry:
     notes: str | None = None
 
 
-def save_timeline(entries: List[TimelineEntry], path: Path):
-    data = [asdict(e) for e in entries]
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+class Timeline:
+    """Per-frame scores stored column-wise in growable typed arrays.
+
+    Labels are kept as uint8 codes into ``LABELS``; ``computed`` is False
+    where the score was carried forward from an earlier frame instead of
+    being scored. Appending is amortised O(1); the arrays double in size
+    when full.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._scores = np.empty(capacity, dtype=np.float32)
+        self._codes = np.empty(capacity, dtype=np.uint8)
+        self._computed = np.empty(capacity, dtype=bool)
+        self._size = 0
+
+    @classmethod
+    def from_arrays(
+        cls,
+        timestamps: Sequence[int],
+        scores: Sequence[float],
+        labels: Sequence[str] | np.ndarray,
+        computed: Sequence[bool] | None = None,
+    ) -> "Timeline":
+        timeline = cls(max(len(timestamps), 1))
+        codes = np.asarray(labels)
+        if codes.dtype.kind in "US":
+            codes = np.array([LABEL_CODES[label] for label in labels], dtype=np.uint8)
+        n = len(timestamps)
+        timeline._timestamps[:n] = timestamps
+        timeline._scores[:n] = scores
+        timeline._codes[:n] = codes
+        timeline._computed[:n] = True if computed is None else computed
+        timeline._size = n
+        return timeline
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self, needed: int):
+        capacity = max(needed, 2 * len(self._timestamps))
+        self._timestamps = np.resize(self._timestamps, capacity)
+        self._scores = np.resize(self._scores, capacity)
+        self._codes = np.resize(self._codes, capacity)
+        self._computed = np.resize(self._computed, capacity)
+
+    def append(self, timestamp_ms: int, label: str, score: float, computed: bool = True):
+        idx = self._size
+        if idx == len(self._timestamps):
+            self._grow(idx + 1)
+        self._timestamps[idx] = timestamp_ms
+        self._scores[idx] = score
+        self._codes[idx] = LABEL_CODES[label]
+        self._computed[idx] = computed
+        self._size = idx + 1
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[: self._size]
+
+    @property
+    def scores(self) -> np.ndarray:
+        return self._scores[: self._size]
+
+    @property
+    def label_codes(self) -> np.ndarray:
+        return self._codes[: self._size]
+
+    @property
+    def computed(self) -> np.ndarray:
+        return self._computed[: self._size]
+
+    def skip_ratio(self) -> float:
+        return float(1.0 - self.computed.mean()) if self._size else 0.0
+
+    def label_at(self, idx: int) -> str:
+        return LABELS[self.label_codes[idx]]
+
+    def labels(self) -> List[str]:
+        return [LABELS[code] for code in self.label_codes.tolist()]
+
+    def entries(self) -> Iterator[TimelineEntry]:
+        for ts, label, score, computed in zip(
+            self.timestamps.tolist(), self.labels(), self.scores.tolist(), self.computed.tolist()
+        ):
+            yield TimelineEntry(timestamp_ms=ts, label=label, score=score, computed=computed)
+
+    def save_npz(self, path: Path):
+        with open(path, "wb") as fh:
+            np.savez(fh, timestamp_ms=self.timestamps, score=self.scores, label=self.label_codes, computed=self.computed)
+
+    def save_json(self, path: Path):
+        scores = self.scores.astype(np.float64).round(6).tolist()
+        data = [
+            {"timestamp_ms": ts, "label": label, "score": score, "computed": computed}
+            for ts, label, score, computed in zip(self.timestamps.tolist(), self.labels(), scores, self.computed.tolist())
+        ]
+        path.write_text(json.dumps(data, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path: Path) -> "Timeline":
+        if path.suffix == ".npz":
+            with np.load(path) as data:
+                # files written before the computed column treat every frame as scored
+                computed = data["computed"] if "computed" in data.files else None
+                return cls.from_arrays(data["timestamp_ms"], data["score"], data["label"], computed)
+        items = json.loads(path.read_text())
+        return cls.from_arrays(
+            [item["timestamp_ms"] for item in items],
+            [item["score"] for item in items],
+            [item["label"] for item in items],
+            [item.get("computed", True) for item in items],
+        )
+
+
+def save_timeline(timeline: Timeline, path: Path):
+    """Writes ``timeline`` as .npz or JSON depending on the suffix of ``path``."""
+    if path.suffix == ".npz":
+        timeline.save_npz(path)
+    else:
+        timeline.save_json(path)
+
+
+def load_timeline(path: Path) -> Timeline:
+    return Timeline.load(path)
+
+
+def load_session_timeline(folder: Path) -> Timeline | None:
+    for name in ("timeline.npz", "timeline.json"):
+        path = folder / name
+        if path.exists():
+            return Timeline.load(path)
+    return None
 
 
 def save_segments(entries: List[SegmentEntry], path: Path):
     data = [asdict(e) for e in entries]
     path.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def load_segments(path: Path) -> List[SegmentEntry]:
+    return [SegmentEntry(**item) for item in json.loads(path.read_text())]
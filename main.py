@@ -11,7 +11,8 @@ from app.storage import Storage
 from app.ui.user_selection import UserSelection
 from app.ui.session_window import SessionWindow
 from app.ui.review_window import ReviewWindow
-from app.utils.exporter import QARecord
+from app.utils.aggregation import build_qa_records
+from app.utils.timeline import Timeline
 
 
 class MainApp(QtWidgets.QApplication):
@@ -23,6 +24,7 @@ class MainApp(QtWidgets.QApplication):
         logging.basicConfig(level=logging.INFO, filename=log_path, filemode="a", format="%(asctime)s %(levelname)s %(message)s")
         self.config = ensure_config(Path.home() / ".thermodeception" / "config.json")
         self.storage = Storage(Path.home() / ".thermodeception" / "session.sqlite")
+        self.aboutToQuit.connect(self.storage.close)
         self.user = None
         self.session_win = None
         self.review_win = None
@@ -45,34 +47,17 @@ class MainApp(QtWidgets.QApplication):
         self.session_win.recording_stopped.connect(self._on_recording_finished)
         self.session_win.show()
 
-    def _on_recording_finished(self, folder: Path, timeline):
+    def _on_recording_finished(self, folder: Path, timeline: Timeline):
         if not folder:
             return
-        # finalize stub QA rows
-        records = []
-        for idx in range(self.session_win.questions_table.rowCount()):
-            question = self.session_win.questions_table.item(idx, 0).text()
-            records.append(
-                {
-                    "number": idx + 1,
-                    "question": question,
-                    "answer_text": "(ASR черновик)",
-                    "verdict": timeline[-1].label if timeline else "Правда",
-                    "start_ms": timeline[0].timestamp_ms if timeline else 0,
-                    "end_ms": timeline[-1].timestamp_ms if timeline else 0,
-                }
-            )
-        qa_records = [
-            QARecord(
-                number=rec["number"],
-                question=rec["question"],
-                answer_text=rec["answer_text"],
-                verdict=rec["verdict"],
-                start_ms=rec["start_ms"],
-                end_ms=rec["end_ms"],
-            )
-            for rec in records
-        ]
+        # the n-th question asked spans the n-th QA segment of the session
+        qa_records = build_qa_records(
+            self.session_win.session_questions,
+            self.session_win.segments,
+            timeline,
+            self.config.threshold_hi,
+            answer_text="(ASR черновик)",
+        )
         review = ReviewWindow(folder, timeline)
         review.load_records(qa_records)
         review.show()